@@ -0,0 +1,223 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright 2017 Marko Dimjašević
+#
+# This file is part of JDoop.
+#
+# JDoop is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# JDoop is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with JDoop.  If not, see <http://www.gnu.org/licenses/>.
+
+# Chooses time budgets for JDart runs, and splits rounds between
+# Randoop and JDart, from how productive earlier runs were
+
+
+import os, math
+import threading
+
+class JDartBudget:
+    """Chooses how long JDart may run on a driver program and how long
+    Z3 may take on a query. Driver programs are grouped by their
+    number of symbolic variables (1, 2, 3-4, 5-8, ...), and a group
+    gets more time the more new concrete values per second its
+    earlier runs found compared to all runs. Groups whose runs tend to
+    time out while still finding values get even more time, and
+    groups whose runs finish on their own get about as much as they
+    need. Runs that timed out only because the round was about to end
+    say nothing about whether their budgets were long enough, and runs
+    stopped early for not finding new values neither timed out nor
+    finished, so neither kind counts toward the timeouts or the
+    finished runs. Every choice and its outcome is logged to a CSV
+    file"""
+
+    DEFAULT_TIMEOUT = 20 # seconds
+    DEFAULT_SOLVER_TIMEOUT = 2000 # milliseconds
+
+    # Before a group has a history, it is assumed to have been as
+    # productive as all runs for this many seconds
+    PRIOR_SECONDS = 20.0
+
+    LOG_COLUMNS = ["round", "driver", "sym_vars", "timeout",
+                   "solver_timeout", "elapsed", "timed_out",
+                   "stopped_early", "deadline_cut", "collected",
+                   "new_values"]
+
+    def __init__(self, log_filename = None, min_timeout = 5, max_timeout = 60,
+                 min_solver_timeout = 500, max_solver_timeout = 10000):
+        self.log_filename = log_filename
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.min_solver_timeout = min_solver_timeout
+        self.max_solver_timeout = max_solver_timeout
+
+        # Per group and in total: number of runs, seconds, new values,
+        # timeouts, runs that finished on their own and their seconds,
+        # and runs stopped early
+        self.groups = {}
+        self.totals = [0, 0.0, 0, 0, 0, 0.0, 0]
+        self.lock = threading.Lock()
+
+        if log_filename != None and not os.path.exists(log_filename):
+            with open(log_filename, 'w') as f:
+                f.write(",".join(self.LOG_COLUMNS) + "\n")
+
+    def group(self, n_sym_vars):
+        return int(math.ceil(math.log(max(n_sym_vars, 1), 2)))
+
+    def budgets(self, n_sym_vars):
+        """Returns a pair of a JDart timeout in seconds and a Z3
+        timeout in milliseconds for a driver program"""
+
+        with self.lock:
+            (runs, seconds, new_values, timeouts, finished, finished_seconds, early_stops) = self.totals
+            if seconds == 0 or new_values == 0:
+                return (self.DEFAULT_TIMEOUT, self.DEFAULT_SOLVER_TIMEOUT)
+            overall_yield = new_values / seconds
+
+            group = self.groups.get(self.group(n_sym_vars), [0, 0.0, 0, 0, 0, 0.0, 0])
+            (runs, seconds, new_values, timeouts, finished, finished_seconds, early_stops) = group
+            group_yield = ((new_values + overall_yield * self.PRIOR_SECONDS) /
+                           (seconds + self.PRIOR_SECONDS))
+            ratio = group_yield / overall_yield
+
+        timeout = self.DEFAULT_TIMEOUT * ratio
+        solver_timeout = self.DEFAULT_SOLVER_TIMEOUT * min(max(ratio, 0.5), 2.0)
+
+        if timeouts + finished > 0:
+            timeout_rate = float(timeouts) / (timeouts + finished)
+            if timeout_rate >= 0.5 and ratio >= 1:
+                # Productive runs are being cut off
+                timeout *= 1.5
+            elif timeout_rate < 0.5 and finished > 0:
+                # Runs mostly finish on their own, so twice their usual
+                # time is plenty
+                timeout = min(timeout, 2 * finished_seconds / finished)
+            if timeout_rate >= 0.5 and ratio < 1:
+                # Unproductive runs that time out are likely stuck in
+                # the solver
+                solver_timeout /= 2
+
+        timeout = int(math.ceil(min(max(timeout, self.min_timeout), self.max_timeout)))
+        # Leave room for several queries within a run
+        solver_timeout = min(solver_timeout, timeout * 1000 / 4)
+        solver_timeout = int(min(max(solver_timeout, self.min_solver_timeout), self.max_solver_timeout))
+
+        return (timeout, solver_timeout)
+
+    def record(self, round_name, driver_name, n_sym_vars, timeout, solver_timeout, elapsed, timed_out, stopped_early, deadline_cut, collected, new_values):
+        """Records the outcome of a JDart run with the given budgets,
+        where deadline_cut tells whether the timeout was cut short to
+        end by the end of the round. A run whose elapsed time isn't
+        known (None) is only logged"""
+
+        with self.lock:
+            if elapsed != None:
+                group = self.groups.setdefault(self.group(n_sym_vars), [0, 0.0, 0, 0, 0, 0.0, 0])
+                for stats in [group, self.totals]:
+                    stats[0] += 1
+                    stats[1] += elapsed
+                    stats[2] += new_values
+                    if stopped_early:
+                        stats[6] += 1
+                    elif timed_out:
+                        if not deadline_cut:
+                            stats[3] += 1
+                    else:
+                        stats[4] += 1
+                        stats[5] += elapsed
+
+            if self.log_filename != None:
+                with open(self.log_filename, 'a') as f:
+                    f.write(",".join([str(field) for field in [
+                        round_name, driver_name, n_sym_vars, timeout,
+                        solver_timeout,
+                        "" if elapsed == None else "%.2f" % elapsed,
+                        "" if timed_out == None else int(timed_out),
+                        int(stopped_early), int(deadline_cut),
+                        collected, new_values]]) + "\n")
+
+
+class PhaseBudget:
+    """Splits the time of a round between Randoop and JDart by how
+    well each of them has been paying off. The yield of a phase in a
+    round is how many new unit tests Randoop kept, or how many new
+    concrete values JDart found, per second. The two are not
+    comparable, so each phase's latest yield is compared to its own
+    average yield so far, and the round time shifts toward the phase
+    whose yield holds up better. Randoop's share of a round stays
+    within given bounds"""
+
+    PHASES = ["Randoop", "JDart"]
+
+    # How far the share moves toward the one that the latest yields
+    # suggest
+    STEP = 0.5
+
+    # A latest yield more than this many times the average doesn't
+    # count for more
+    MAX_RELATIVE_YIELD = 4.0
+
+    def __init__(self, randoop_time, jdart_time, min_randoop_share = 0.2, max_randoop_share = 0.9):
+        self.round_time = randoop_time + jdart_time
+        self.min_randoop_share = min_randoop_share
+        self.max_randoop_share = max_randoop_share
+        self.randoop_share = min(max(float(randoop_time) / self.round_time,
+                                     min_randoop_share), max_randoop_share)
+
+        # Per phase: yields of its rounds so far
+        self.yields = dict([(phase, []) for phase in self.PHASES])
+        # Per round: the round, Randoop and JDart times chosen for the
+        # next round, and the latest yields they were chosen by
+        self.decisions = []
+
+    def record(self, phase, seconds, gain):
+        """Records how much a phase gained in a round that took it a
+        number of seconds"""
+
+        if seconds > 0:
+            self.yields[phase].append(gain / float(seconds))
+
+    def relative_yield(self, phase):
+        yields = self.yields[phase]
+        if yields == []:
+            return None
+        average = sum(yields) / len(yields)
+        if average == 0:
+            return 0.0
+        return min(yields[-1] / average, self.MAX_RELATIVE_YIELD)
+
+    def budgets(self):
+        """Returns a pair of Randoop and JDart times for a round, in
+        seconds"""
+
+        randoop_time = max(int(round(self.round_time * self.randoop_share)), 1)
+        return (randoop_time, max(self.round_time - randoop_time, 1))
+
+    def rebalance(self, round_name):
+        """Chooses Randoop's share of the next round from the yields so
+        far, records the decision, and returns the Randoop and JDart
+        times of the next round"""
+
+        randoop_yield = self.relative_yield("Randoop")
+        jdart_yield = self.relative_yield("JDart")
+        if randoop_yield != None and jdart_yield != None and randoop_yield + jdart_yield > 0:
+            share = self.randoop_share
+            target = share * randoop_yield / (share * randoop_yield + (1 - share) * jdart_yield)
+            share += self.STEP * (target - share)
+            self.randoop_share = min(max(share, self.min_randoop_share), self.max_randoop_share)
+
+        (randoop_time, jdart_time) = self.budgets()
+        latest_yields = [self.yields[phase][-1] if self.yields[phase] else 0.0
+                         for phase in self.PHASES]
+        self.decisions.append([round_name, randoop_time, jdart_time] + latest_yields)
+        return (randoop_time, jdart_time)
@@ -0,0 +1,499 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright 2017 Marko Dimjašević
+#
+# This file is part of JDoop.
+#
+# JDoop is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# JDoop is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with JDoop.  If not, see <http://www.gnu.org/licenses/>.
+
+# Reads class files of the system under test, keeps an index of
+# which of its classes Randoop can test, and harvests literals from
+# them
+
+
+import os, sys
+import struct
+import time
+import math
+import cPickle
+from collections import OrderedDict
+
+ACC_PUBLIC = 0x0001
+ACC_STATIC = 0x0008
+ACC_INTERFACE = 0x0200
+ACC_ABSTRACT = 0x0400
+ACC_ANNOTATION = 0x2000
+ACC_MODULE = 0x8000
+
+# Constant pool tags
+CONSTANT_UTF8 = 1
+CONSTANT_INTEGER = 3
+CONSTANT_FLOAT = 4
+CONSTANT_LONG = 5
+CONSTANT_DOUBLE = 6
+CONSTANT_CLASS = 7
+CONSTANT_STRING = 8
+
+# Sizes of constant pool entries other than Utf8 ones, without the tag
+constant_sizes = {
+    3: 4, 4: 4, 5: 8, 6: 8, 7: 2, 8: 2, 9: 4, 10: 4, 11: 4, 12: 4,
+    15: 3, 16: 2, 17: 4, 18: 4, 19: 2, 20: 2
+}
+
+# Opcodes of JVM instructions that harvesting literals cares about
+BIPUSH = 0x10
+SIPUSH = 0x11
+TABLESWITCH = 0xaa
+LOOKUPSWITCH = 0xab
+WIDE = 0xc4
+IINC = 0x84
+
+# Lengths of JVM instructions by their opcodes, other than the
+# variable-length tableswitch, lookupswitch and wide instructions
+instruction_lengths = [1] * 256
+for (opcodes, length) in [
+        ([0x10, 0x12, 0xa9, 0xbc], 2),
+        (range(0x15, 0x1a) + range(0x36, 0x3b), 2),
+        ([0x11, 0x13, 0x14, 0x84, 0xbb, 0xbd, 0xc0, 0xc1, 0xc6, 0xc7], 3),
+        (range(0x99, 0xa9) + range(0xb2, 0xb9), 3),
+        ([0xc5], 4),
+        ([0xb9, 0xba, 0xc8, 0xc9], 5)]:
+    for opcode in opcodes:
+        instruction_lengths[opcode] = length
+
+# Randoop doesn't use longer strings by default
+MAX_STRING_LENGTH = 10000
+
+def java_string_literal(s):
+    """Returns a Java string literal, in ASCII, for a unicode string"""
+
+    chars = ['"']
+    for c in s:
+        code = ord(c)
+        if c == '"' or c == '\\':
+            chars.append('\\' + c)
+        elif 0x20 <= code < 0x7f:
+            chars.append(c)
+        elif c == '\n':
+            chars.append('\\n')
+        elif c == '\t':
+            chars.append('\\t')
+        elif c == '\r':
+            chars.append('\\r')
+        elif code > 0xffff:
+            code -= 0x10000
+            chars.append('\\u%04x\\u%04x' % (0xd800 + (code >> 10), 0xdc00 + (code & 0x3ff)))
+        else:
+            chars.append('\\u%04x' % code)
+    chars.append('"')
+    return str("".join(chars))
+
+def java_floating_point_literal(x):
+    """Returns a number in a form that Java can parse back to the same
+    float or double"""
+
+    if math.isnan(x):
+        return "NaN"
+    if math.isinf(x):
+        return "Infinity" if x > 0 else "-Infinity"
+    return repr(x)
+
+
+class ClassFormatError(Exception):
+    pass
+
+
+class ClassFile:
+    """The parts of a class file that JDoop needs: the constant pool,
+    the access flags and the name of the class, and the methods with
+    their attributes. Entries of the constant pool are (tag, offset)
+    pairs, where the offset is where the entry's data starts in the
+    class file, and are only decoded on request"""
+
+    def __init__(self, data):
+        self.data = data
+        try:
+            self.parse()
+        except struct.error, err:
+            raise ClassFormatError("Truncated class file: %s" % err)
+
+    def parse(self):
+        data = self.data
+        if data[:4] != "\xca\xfe\xba\xbe":
+            raise ClassFormatError("Not a class file")
+
+        (count,) = struct.unpack_from(">H", data, 8)
+        self.constant_pool = [None] * count
+        offset = 10
+        i = 1
+        while i < count:
+            tag = ord(data[offset])
+            self.constant_pool[i] = (tag, offset + 1)
+            if tag == CONSTANT_UTF8:
+                (length,) = struct.unpack_from(">H", data, offset + 1)
+                offset += 3 + length
+            elif tag in constant_sizes:
+                offset += 1 + constant_sizes[tag]
+            else:
+                raise ClassFormatError("Unknown constant pool tag %i" % tag)
+            # Long and double constants take two entries
+            if tag == CONSTANT_LONG or tag == CONSTANT_DOUBLE:
+                i += 2
+            else:
+                i += 1
+
+        (self.access_flags, this_class, super_class, interfaces_count) = \
+            struct.unpack_from(">HHHH", data, offset)
+        self.name = self.class_name(this_class)
+        offset += 8 + 2 * interfaces_count
+
+        (offset, self.fields) = self.parse_members(offset)
+        (offset, self.methods) = self.parse_members(offset)
+
+    def parse_members(self, offset):
+        """Parses fields or methods starting at an offset into a list of
+        (access flags, name, descriptor, attributes) quadruples, where
+        attributes map names to (offset, length) pairs"""
+
+        data = self.data
+        (count,) = struct.unpack_from(">H", data, offset)
+        offset += 2
+        members = []
+        for _ in xrange(count):
+            (access_flags, name_index, descriptor_index, attributes_count) = \
+                struct.unpack_from(">HHHH", data, offset)
+            offset += 8
+            attributes = {}
+            for _ in xrange(attributes_count):
+                (attribute_name_index, length) = struct.unpack_from(">HI", data, offset)
+                attributes[self.utf8(attribute_name_index)] = (offset + 6, length)
+                offset += 6 + length
+            members.append((access_flags, self.utf8(name_index),
+                            self.utf8(descriptor_index), attributes))
+        return (offset, members)
+
+    def utf8(self, index):
+        (tag, offset) = self.constant_pool[index]
+        (length,) = struct.unpack_from(">H", self.data, offset)
+        return self.data[offset + 2:offset + 2 + length]
+
+    def string(self, index):
+        """Decodes a Utf8 constant, which is in a modified UTF-8, into a
+        unicode string"""
+
+        return self.utf8(index).replace("\xc0\x80", "\x00").decode("utf-8", "replace")
+
+    def class_name(self, index):
+        """Returns the binary name of a class that a Class constant
+        refers to, e.g. java.util.Map$Entry"""
+
+        (tag, offset) = self.constant_pool[index]
+        (name_index,) = struct.unpack_from(">H", self.data, offset)
+        return self.utf8(name_index).replace("/", ".")
+
+    def literals(self):
+        """Returns the int, long, float, double and String constants of
+        the class in the type:value format of Randoop, without
+        repetitions. Besides the constant pool, they come from
+        operands of bipush and sipush instructions, as ldc
+        instructions only load constants from the pool"""
+
+        data = self.data
+        literals = OrderedDict()
+        for entry in self.constant_pool:
+            if entry == None:
+                continue
+            (tag, offset) = entry
+            if tag == CONSTANT_INTEGER:
+                literals["int:%i" % struct.unpack_from(">i", data, offset)] = None
+            elif tag == CONSTANT_LONG:
+                literals["long:%i" % struct.unpack_from(">q", data, offset)] = None
+            elif tag == CONSTANT_FLOAT:
+                literals["float:" + java_floating_point_literal(struct.unpack_from(">f", data, offset)[0])] = None
+            elif tag == CONSTANT_DOUBLE:
+                literals["double:" + java_floating_point_literal(struct.unpack_from(">d", data, offset)[0])] = None
+            elif tag == CONSTANT_STRING:
+                (string_index,) = struct.unpack_from(">H", data, offset)
+                s = self.string(string_index)
+                if len(s) <= MAX_STRING_LENGTH:
+                    literals["java.lang.String:" + java_string_literal(s)] = None
+
+        for (access_flags, name, descriptor, attributes) in self.methods:
+            if "Code" not in attributes:
+                continue
+            (offset, length) = attributes["Code"]
+            (code_length,) = struct.unpack_from(">I", data, offset + 4)
+            code_start = offset + 8
+            for value in self.pushed_values(code_start, code_start + code_length):
+                literals["int:%i" % value] = None
+
+        return literals.keys()
+
+    def pushed_values(self, code_start, code_end):
+        """Returns operands of bipush and sipush instructions of a
+        method's code"""
+
+        data = self.data
+        code = data[code_start:code_end]
+        values = []
+        # Most methods push no constants this way
+        if chr(BIPUSH) not in code and chr(SIPUSH) not in code:
+            return values
+
+        lengths = instruction_lengths
+        pc = 0
+        end = len(code)
+        while pc < end:
+            opcode = ord(code[pc])
+            if opcode == BIPUSH:
+                values.append(struct.unpack_from(">b", code, pc + 1)[0])
+            elif opcode == SIPUSH:
+                values.append(struct.unpack_from(">h", code, pc + 1)[0])
+            elif opcode == TABLESWITCH:
+                # Operands are aligned to 4 bytes from the start of the
+                # code
+                operands = pc + 4 - pc % 4
+                (low, high) = struct.unpack_from(">ii", code, operands + 4)
+                pc = operands + 12 + 4 * (high - low + 1)
+                continue
+            elif opcode == LOOKUPSWITCH:
+                operands = pc + 4 - pc % 4
+                (pairs,) = struct.unpack_from(">i", code, operands + 4)
+                pc = operands + 8 + 8 * pairs
+                continue
+            elif opcode == WIDE:
+                pc += 6 if ord(code[pc + 1]) == IINC else 4
+                continue
+            pc += lengths[opcode]
+        return values
+
+    def testability(self):
+        """Returns why Randoop can't test the class, or None if it
+        can. Randoop can test a public class that isn't an interface
+        if it can make objects of the class with a public constructor
+        or a public static method that returns one, or if it has
+        public static methods to call"""
+
+        flags = self.access_flags
+        if flags & ACC_MODULE:
+            return "module"
+        if flags & ACC_ANNOTATION:
+            return "annotation"
+        if flags & ACC_INTERFACE:
+            return "interface"
+        if not flags & ACC_PUBLIC:
+            return "not public"
+        if "$" in self.name:
+            # Nested classes don't have a source file of their own,
+            # and the list of classes never had them
+            return "nested"
+
+        returns_class = ")L%s;" % self.name.replace(".", "/")
+        has_static_methods = False
+        for (access_flags, name, descriptor, attributes) in self.methods:
+            if not access_flags & ACC_PUBLIC:
+                continue
+            if name == "<init>":
+                if not flags & ACC_ABSTRACT:
+                    return None
+            elif access_flags & ACC_STATIC and name != "<clinit>":
+                if descriptor.endswith(returns_class):
+                    return None
+                has_static_methods = True
+
+        if has_static_methods:
+            return None
+        if flags & ACC_ABSTRACT:
+            return "abstract"
+        return "no public constructor"
+
+
+class ClassIndex:
+    """An index of the class files in a directory, saved to a file.
+    For every class file, it keeps the name of the class and why
+    Randoop can't test it, if it can't. A class file is read again
+    only if its modification time or size changed since it was
+    indexed"""
+
+    # Saved indexes in other formats are ignored
+    FORMAT = 1
+
+    def __init__(self, class_dir, filename = None):
+        self.class_dir = class_dir
+        self.filename = filename
+        # Maps a path of a class file relative to class_dir to a
+        # (modification time, size, class name, reason) tuple
+        self.entries = {}
+        self.files_read = 0
+
+        if filename != None and os.path.exists(filename):
+            try:
+                with open(filename, 'rb') as f:
+                    (saved_format, saved_dir, entries) = cPickle.load(f)
+                if saved_format == self.FORMAT and saved_dir == os.path.abspath(class_dir):
+                    self.entries = entries
+            except Exception, err:
+                sys.stderr.write("Ignoring the class index %s: %s\n" % (filename, err))
+
+    def update(self):
+        """Brings the index up to date with the class files in the
+        directory and saves it"""
+
+        entries = {}
+        self.files_read = 0
+        for (dirpath, dirnames, filenames) in os.walk(self.class_dir):
+            for name in filenames:
+                if not name.endswith(".class"):
+                    continue
+                path = os.path.join(dirpath, name)
+                relative_path = os.path.relpath(path, self.class_dir)
+                status = os.stat(path)
+
+                entry = self.entries.get(relative_path)
+                if entry == None or entry[:2] != (status.st_mtime, status.st_size):
+                    self.files_read += 1
+                    try:
+                        with open(path, 'rb') as f:
+                            class_file = ClassFile(f.read())
+                        entry = (status.st_mtime, status.st_size,
+                                 class_file.name, class_file.testability())
+                    except ClassFormatError, err:
+                        entry = (status.st_mtime, status.st_size, None, str(err))
+                entries[relative_path] = entry
+        self.entries = entries
+
+        if self.filename != None:
+            with open(self.filename + ".tmp", 'wb') as f:
+                cPickle.dump((self.FORMAT, os.path.abspath(self.class_dir), entries), f, cPickle.HIGHEST_PROTOCOL)
+            os.rename(self.filename + ".tmp", self.filename)
+
+    def testable_classes(self):
+        """Returns names of classes that Randoop can test, sorted"""
+
+        return sorted([name for (mtime, size, name, reason) in self.entries.itervalues()
+                       if reason == None])
+
+    def rejected_classes(self):
+        """Returns a map from reasons why Randoop can't test classes to
+        how many classes there are for each reason"""
+
+        reasons = {}
+        for (mtime, size, name, reason) in self.entries.itervalues():
+            if reason != None:
+                reasons[reason] = reasons.get(reason, 0) + 1
+        return reasons
+
+
+def harvest_literals(class_dir, class_names):
+    """Returns literals of classes, by class name, in the order of the
+    given class names, leaving out classes without literals. Literals
+    of a nested class are literals of its top-level class. Class files
+    that can't be read are skipped"""
+
+    wanted = set(class_names)
+    harvested = {}
+    for (dirpath, dirnames, filenames) in os.walk(class_dir):
+        for name in filenames:
+            if not name.endswith(".class"):
+                continue
+            relative_path = os.path.relpath(os.path.join(dirpath, name), class_dir)
+            class_name = relative_path[:-len(".class")].replace(os.sep, ".").split("$")[0]
+            if class_name not in wanted:
+                continue
+            try:
+                with open(os.path.join(dirpath, name), 'rb') as f:
+                    literals = ClassFile(f.read()).literals()
+            except (IOError, ClassFormatError), err:
+                sys.stderr.write("Couldn't read literals of %s: %s\n" % (relative_path, err))
+                continue
+            harvested.setdefault(class_name, OrderedDict()).update(
+                [(literal, None) for literal in literals])
+
+    return OrderedDict([(class_name, harvested[class_name].keys())
+                        for class_name in class_names
+                        if harvested.get(class_name)])
+
+
+def benchmark_index(class_dir, source_dir = None):
+    """Measures how long indexing the class files in a directory takes
+    from scratch and with an up-to-date index on the disk, and how
+    many classes the index keeps from Randoop compared to a list of
+    classes from source files"""
+
+    import tempfile
+
+    (handle, index_filename) = tempfile.mkstemp(suffix=".index")
+    os.close(handle)
+    os.remove(index_filename)
+    try:
+        start_time = time.time()
+        index = ClassIndex(class_dir, index_filename)
+        index.update()
+        cold_time = time.time() - start_time
+
+        start_time = time.time()
+        index = ClassIndex(class_dir, index_filename)
+        index.update()
+        warm_time = time.time() - start_time
+    finally:
+        if os.path.exists(index_filename):
+            os.remove(index_filename)
+
+    testable = index.testable_classes()
+    print "Class files: %d" % len(index.entries)
+    print "Indexing from scratch: %.3f s (%.0f class files/s)" % (
+        cold_time, len(index.entries) / max(cold_time, 1e-9))
+    print "Indexing with a saved index: %.3f s, %d class files read" % (
+        warm_time, index.files_read)
+    print "Classes Randoop can test: %d" % len(testable)
+    for (reason, count) in sorted(index.rejected_classes().iteritems()):
+        print "  rejected (%s): %d" % (reason, count)
+
+    if source_dir != None:
+        sources = set()
+        for (dirpath, dirnames, filenames) in os.walk(source_dir):
+            for name in filenames:
+                if name.endswith(".java") and not name.startswith("package-info"):
+                    package_name = os.path.relpath(dirpath, source_dir).replace(os.sep, ".")
+                    sources.add(name[:-len(".java")] if package_name == "." else
+                                package_name + "." + name[:-len(".java")])
+        print "Classes from source files: %d, of which Randoop can test %d" % (
+            len(sources), len(sources.intersection(testable)))
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Indexes class files of a system under test for JDoop.')
+    parser.add_argument('--benchmark', required=True, help='A directory with class files to measure indexing on')
+    parser.add_argument('--source-dir', default=None, help='A directory with source files to compare the index to')
+    parser.add_argument('--literals', default=False, action="store_true", help='Measure harvesting literals from the class files instead')
+    params = parser.parse_args()
+
+    if params.literals:
+        class_names = set()
+        for (dirpath, dirnames, filenames) in os.walk(params.benchmark):
+            for name in filenames:
+                if name.endswith(".class"):
+                    relative_path = os.path.relpath(os.path.join(dirpath, name), params.benchmark)
+                    class_names.add(relative_path[:-len(".class")].replace(os.sep, ".").split("$")[0])
+        start_time = time.time()
+        harvested = harvest_literals(params.benchmark, sorted(class_names))
+        harvest_time = time.time() - start_time
+        print "Harvested %d literals of %d classes in %.3f s" % (
+            sum([len(literals) for literals in harvested.itervalues()]),
+            len(harvested), harvest_time)
+    else:
+        benchmark_index(params.benchmark, params.source_dir)
@@ -6,7 +6,10 @@
 rm -rf tests-round-*
 rm -rf build/
 rm -f concrete-values*
-rm -f classlist.txt
+rm -f classlist.txt classlist-shard-*.txt
 rm -rf jacoco-site/
 rm -f jdart-regular-executions.txt
 rm -rf randooped*
+rm -rf jdart-worker-*
+rm -f jdart-budgets.csv
+rm -f jdart-early-stop-count.txt
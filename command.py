@@ -19,25 +19,146 @@
 
 
 import subprocess, threading
-import os, signal
+import os, signal, sys, time
+
+from jvm_daemon import DaemonError
 
 count_file = "jdart-termination-count.txt"
+early_stop_count_file = "jdart-early-stop-count.txt"
+
+# Several JDart workers can hit a timeout at the same time, so updates
+# of the count files have to be serialized
+count_file_lock = threading.Lock()
+
+def increment_count(filename):
+    with count_file_lock:
+        try:
+            with open(filename, 'r') as f:
+                countStr = f.read()
+        except Exception, err:
+            countStr = "0"
+        count = int(countStr) + 1
+        with open(filename, 'w') as f:
+            f.write("%i" % count)
+
+def read_count(filename):
+    with count_file_lock:
+        try:
+            with open(filename, 'r') as f:
+                return int(f.read())
+        except Exception, err:
+            return 0
+
+# A JVM daemon that runs commands given as jobs instead of starting a
+# new process for each of them. None means that every command gets
+# its own process
+_jvm_daemon = None
+
+def use_jvm_daemon(daemon):
+    global _jvm_daemon
+    _jvm_daemon = daemon
+
+
+def run_in_jvm_daemon(job):
+    """Runs a job in the JVM daemon if there is one. Returns the job's
+    exit status and error output, or None if the caller should start a
+    process instead"""
+
+    if job == None or _jvm_daemon == None:
+        return None
+
+    try:
+        return _jvm_daemon.run_job(job)
+    except DaemonError, err:
+        print 'JVM daemon failed, starting a process instead: %s' % err
+        return None
+
 
 class Command:
-    def __init__(self, args):
+    def __init__(self, args, capture_stderr = False, job = None):
         self.process = None
         self.args = args
+        self.capture_stderr = capture_stderr
+        self.stderr = None
+        self.job = job
+        self.returncode = None
 
     def run(self):
-        self.process = subprocess.Popen(args=self.args, shell=True)
-        self.process.communicate()
+        result = run_in_jvm_daemon(self.job)
+        if result != None:
+            (self.returncode, self.stderr) = result
+            sys.stderr.write(self.stderr)
+            return
+
+        if self.capture_stderr:
+            # Keep a copy of the error output for the caller, but
+            # still show it to the user
+            self.process = subprocess.Popen(args=self.args, shell=True, stderr=subprocess.PIPE)
+            (_, self.stderr) = self.process.communicate()
+            sys.stderr.write(self.stderr)
+        else:
+            self.process = subprocess.Popen(args=self.args, shell=True)
+            self.process.communicate()
+        self.returncode = self.process.returncode
+
+
+class StallDetector:
+    """Tells whether a command stopped making progress, i.e. whether no
+    new type:value lines were appended to its values file for window
+    seconds. A command is only considered stalled once it has written
+    at least one line, as a command that writes its values at the end
+    would look stalled all along otherwise. What is in the file
+    before the command starts doesn't count"""
+
+    def __init__(self, filename, window):
+        self.filename = filename
+        self.window = window
+        self.last_progress = None
+        self.partial_line = ""
+        try:
+            self.offset = os.path.getsize(filename)
+        except OSError:
+            self.offset = 0
+
+    def __call__(self):
+        now = time.time()
+        try:
+            with open(self.filename, 'r') as f:
+                f.seek(0, os.SEEK_END)
+                if f.tell() < self.offset:
+                    # The file was truncated and written anew
+                    self.offset = 0
+                    self.partial_line = ""
+                f.seek(self.offset)
+                new_text = f.read()
+        except IOError:
+            new_text = ""
+        self.offset += len(new_text)
+
+        lines = (self.partial_line + new_text).split("\n")
+        self.partial_line = lines.pop()
+        if [line for line in lines if ":" in line]:
+            self.last_progress = now
+
+        return (self.last_progress != None and
+                now - self.last_progress >= self.window)
 
 
 class CommandWithTimeout:
-    def __init__(self, args = None):
+    """A command that can be killed. It always runs as a process of its
+    own and never in the JVM daemon, which can't stop a job without
+    risking the state it shares with every later job"""
+
+    # How often to check for a stall, in seconds
+    stall_poll_interval = 0.5
+
+    def __init__(self, args = None, stall_detector = None):
         self.process = None
         self.args = args
         self.thread = None
+        self.timed_out = False
+        self.stall_detector = stall_detector
+        self.stopped_early = False
 
     def run_without_joining(self):
         def target():
@@ -51,19 +172,29 @@ class CommandWithTimeout:
         if timeout == None:
             self.thread.join()
         else:
-            self.thread.join(timeout)
+            if self.stall_detector == None:
+                self.thread.join(timeout)
+            else:
+                deadline = time.time() + timeout
+                while self.thread.is_alive():
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        break
+                    self.thread.join(min(remaining, self.stall_poll_interval))
+                    if self.thread.is_alive() and self.stall_detector():
+                        self.stopped_early = True
+                        break
+
             if self.thread.is_alive():
                 os.killpg(self.process.pid, signal.SIGTERM)
                 self.thread.join()
-                print 'Timeout Termination: ' + self.args
-                try:
-                    with open(count_file, 'r') as f:
-                        countStr = f.read()
-                except Exception, err:
-                    countStr = "0"
-                count = int(countStr) + 1
-                with open(count_file, 'w') as f:
-                    f.write("%i" % count)
+                if self.stopped_early:
+                    print 'Early Termination (stalled): ' + self.args
+                    increment_count(early_stop_count_file)
+                else:
+                    self.timed_out = True
+                    print 'Timeout Termination: ' + self.args
+                    increment_count(count_file)
 
     def run(self, timeout = None):
 
@@ -0,0 +1,301 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright 2017 Marko Dimjašević
+#
+# This file is part of JDoop.
+#
+# JDoop is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# JDoop is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with JDoop.  If not, see <http://www.gnu.org/licenses/>.
+
+# Stores concrete values that JDart finds, reads them from values
+# files a bit at a time, and picks which of them to give to Randoop
+
+
+import os
+import heapq
+from collections import OrderedDict
+
+class ConcreteValues:
+    """A set of concrete values in the type:value format, kept per
+    type. The type and the value of an added line are interned, so
+    equal values read from different files share their strings"""
+
+    def __init__(self, lines = []):
+        # Maps a type to the set of its values
+        self.values = {}
+        self.size = 0
+        self.update(lines)
+
+    def split(self, line):
+        (value_type, _, value) = line.partition(":")
+        return (intern(value_type), intern(value))
+
+    def add(self, line):
+        """Adds a line and returns whether it is new to the set"""
+
+        (value_type, value) = self.split(line)
+        values = self.values.setdefault(value_type, set())
+        if value in values:
+            return False
+        values.add(value)
+        self.size += 1
+        return True
+
+    def update(self, lines):
+        """Adds lines and returns how many of them are new to the
+        set"""
+
+        before_size = self.size
+        for line in lines:
+            self.add(line)
+        return self.size - before_size
+
+    def __contains__(self, line):
+        (value_type, _, value) = line.partition(":")
+        return value in self.values.get(value_type, ())
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        for (value_type, values) in self.values.iteritems():
+            for value in values:
+                yield value_type + ":" + value
+
+
+class ValuesFile:
+    """A values file that JDart appends type:value lines to. Every
+    call to read() reads only what was appended since the last call,
+    unless the file was replaced or truncated in the meantime, in
+    which case it is read from the start again"""
+
+    # How many bytes from the start of the file are compared to tell
+    # whether it was replaced
+    PREFIX_SIZE = 256
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.reset()
+
+    def reset(self):
+        self.offset = 0
+        self.inode = None
+        self.prefix = ""
+        # Distinct lines of the file read so far, and distinct lines
+        # appended to it since the previous read
+        self.lines = ConcreteValues()
+        self.appended = set()
+        # The set of values of a round that the lines were last
+        # merged into
+        self.merged_into = None
+
+    def replaced(self, f):
+        status = os.fstat(f.fileno())
+        if status.st_ino != self.inode or status.st_size < self.offset:
+            return True
+        f.seek(0)
+        return f.read(len(self.prefix)) != self.prefix
+
+    def read(self):
+        """Returns the distinct lines appended to the file since the
+        last read that weren't in the file already"""
+
+        try:
+            f = open(self.filename, 'r')
+        except IOError:
+            self.reset()
+            return []
+        self.appended = set()
+
+        with f:
+            if self.replaced(f):
+                self.reset()
+                self.inode = os.fstat(f.fileno()).st_ino
+            f.seek(self.offset)
+            text = f.read()
+
+        # A line that isn't finished yet is read next time
+        end = text.rfind("\n") + 1
+        text = text[:end]
+        if len(self.prefix) < self.PREFIX_SIZE:
+            self.prefix = (self.prefix + text)[:self.PREFIX_SIZE]
+        self.offset += end
+
+        new_lines = []
+        for line in text.split("\n"):
+            if ":" in line:
+                self.appended.add(line)
+                if self.lines.add(line):
+                    new_lines.append(line)
+        return new_lines
+
+
+class StoredLiteral:
+    def __init__(self, round_index, round_name, driver_name):
+        # Classes under test that driver programs producing the value
+        # exercised, with how many of the runs exercised each
+        self.classes = {}
+        # How many JDart runs produced the value
+        self.runs = 0
+        # Runs that produced the value, discounted by their age in
+        # rounds
+        self.score = 0.0
+        self.last_round = round_index
+        # Where the value was found first
+        self.provenance = (round_name, driver_name)
+
+
+class LiteralsStore:
+    """Keeps every concrete value JDart found together with how often
+    and how recently JDart runs produced it, and chooses which values
+    Randoop gets as literals. With max_values of 0 Randoop gets all of
+    them; otherwise it gets that many of the best ranked ones, where
+    the ranking is one of:
+
+    frequency          - the most JDart runs produced the value
+    recency            - a JDart run produced the value lately
+    decayed-frequency  - like frequency, but a run counts decay times
+                         less for every round that passed since
+
+    With max_classes other than 0, a value is given as a literal of at
+    most that many classes"""
+
+    RANKINGS = ["frequency", "recency", "decayed-frequency"]
+
+    def __init__(self, max_values = 0, ranking = "decayed-frequency", decay = 0.5, max_classes = 10):
+        if ranking not in self.RANKINGS:
+            raise ValueError("Unknown ranking of literals: %s" % ranking)
+        self.max_values = max_values
+        self.ranking = ranking
+        self.decay = decay
+        self.max_classes = max_classes
+
+        # Maps a type:value line to a StoredLiteral
+        self.literals = {}
+        self.round_index = 0
+        self.round_name = None
+        # Per round: how many values were exported and how many were
+        # left out, and the name of the round
+        self.export_stats = []
+
+    def start_round(self, round_name):
+        self.round_index += 1
+        self.round_name = round_name
+
+    def record(self, lines, driver_name, classes = ()):
+        """Records values that a JDart run on a driver program
+        produced, along with classes under test that the driver
+        program exercised"""
+
+        classes = [intern(c) for c in classes]
+        for line in lines:
+            literal = self.literals.get(line)
+            if literal == None:
+                literal = StoredLiteral(self.round_index, self.round_name, driver_name)
+                self.literals[intern(line)] = literal
+            literal.score = (literal.score * self.decay ** (self.round_index - literal.last_round)) + 1
+            literal.runs += 1
+            literal.last_round = self.round_index
+            for c in classes:
+                literal.classes[c] = literal.classes.get(c, 0) + 1
+
+    def provenance(self, line):
+        """Returns the name of the round and the driver program that a
+        value was found by first"""
+
+        return self.literals[line].provenance
+
+    def rank_key(self, line):
+        literal = self.literals[line]
+        if self.ranking == "frequency":
+            return (literal.runs, literal.last_round, line)
+        if self.ranking == "recency":
+            return (literal.last_round, literal.runs, line)
+        return (literal.score * self.decay ** (self.round_index - literal.last_round),
+                literal.last_round, line)
+
+    def export(self):
+        """Returns the values to give to Randoop this round, best
+        ranked first, and records how many were left out. If one
+        boolean value is given, the other one is given too, even past
+        max_values"""
+
+        if self.max_values > 0 and len(self.literals) > self.max_values:
+            exported = heapq.nlargest(self.max_values, self.literals, key=self.rank_key)
+        else:
+            exported = sorted(self.literals, key=self.rank_key, reverse=True)
+
+        booleans = set(["boolean:true", "boolean:false"])
+        if len(booleans.intersection(exported)) == 1:
+            exported += list(booleans.difference(exported))
+
+        left_out = len(self.literals) - len(set(exported).intersection(self.literals))
+        self.export_stats.append([len(exported), left_out, self.round_name])
+        return exported
+
+    def by_class(self, lines, all_classes, level = "ALL"):
+        """Groups values by classes under test they are literals of for
+        Randoop, keeping the order of the values. Randoop uses the
+        literals of a class for that class only at the CLASS level,
+        for the whole package of the class at the PACKAGE level, and
+        for all classes at the ALL level. So a value goes with the
+        classes it was found for, with one of them per package, or
+        with one of them, respectively, taking the classes it was
+        found for most often first. A value that wasn't found for any
+        class goes with every class, with one class per package, or
+        with one class, respectively. Past max_classes classes, a
+        value that wasn't found for any class goes with the next
+        max_classes classes in turn, so that every class gets its
+        share of such values"""
+
+        if level == "CLASS":
+            everywhere = all_classes
+        elif level == "PACKAGE":
+            packages = OrderedDict()
+            for c in all_classes:
+                packages.setdefault(c.rpartition(".")[0], c)
+            everywhere = packages.values()
+        else:
+            everywhere = all_classes[:1]
+
+        groups = OrderedDict()
+        # Where the next value that wasn't found for any class starts
+        # in everywhere
+        turn = 0
+        for line in lines:
+            literal = self.literals.get(line)
+            if literal == None or not literal.classes:
+                classes = everywhere
+                if self.max_classes > 0 and len(classes) > self.max_classes:
+                    classes = (classes[turn:] + classes[:turn])[:self.max_classes]
+                    turn = (turn + self.max_classes) % len(everywhere)
+            else:
+                found_for = literal.classes
+                classes = sorted(found_for, key=lambda c: (-found_for[c], c))
+                if level == "ALL":
+                    classes = classes[:1]
+                elif level == "PACKAGE":
+                    packages = set()
+                    per_package = []
+                    for c in classes:
+                        package = c.rpartition(".")[0]
+                        if package not in packages:
+                            packages.add(package)
+                            per_package.append(c)
+                    classes = per_package
+                if self.max_classes > 0:
+                    classes = classes[:self.max_classes]
+            for c in classes:
+                groups.setdefault(c, []).append(line)
+        return groups
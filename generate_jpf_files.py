@@ -24,7 +24,9 @@ import re, os
 class GenerateConfFile:
 
     def __init__(self, packagename, classpath, gen_package_name, source_dir,
-                 sym_var_list, benchmark_id, no_nhandler):
+                 sym_var_list, benchmark_id, no_nhandler,
+                 values_file = "concrete-values-jdart.txt",
+                 solver_timeout = 2000):
 
         self.class_name = None
         self.package_name = packagename
@@ -34,14 +36,57 @@ class GenerateConfFile:
         self.sym_var_list = sym_var_list
         self.benchmark_id = benchmark_id
         self.no_nhandler = no_nhandler
+        self.values_file = values_file
+        self.solver_timeout = solver_timeout
 
-    def generate_jpf_conf_file(self, input_file_name, output_file_name):
+    def generate_jpf_conf_file(self, class_name, method_name, output_file_name):
 
-        method_counter = 1
         output_file = open(output_file_name, 'w')
 
         output_file.write("# This is an automatically generated configuration file\n\n")
 
+        self.write_nhandler_settings(output_file)
+        self.write_driver_settings(output_file, class_name, method_name)
+        self.write_jdart_settings(output_file)
+        self.write_test_generation_settings(output_file, output_file_name)
+        self.write_log_settings(output_file)
+
+        output_file.close()
+
+    def generate_session_conf_file(self, output_file_name):
+        """Writes settings shared by all driver programs in a JPF
+        session (see jpf-session/JDoopJPFSession.java). Each driver
+        gets a time budget of its own, which JPF's BudgetChecker
+        enforces"""
+
+        output_file = open(output_file_name, 'w')
+
+        output_file.write("# This is an automatically generated configuration file\n\n")
+
+        self.write_nhandler_settings(output_file)
+        self.write_jdart_settings(output_file)
+        output_file.write("listener+=,gov.nasa.jpf.listener.BudgetChecker\n")
+        output_file.write("\n")
+        self.write_log_settings(output_file)
+
+        output_file.close()
+
+    def generate_driver_conf_file(self, class_name, method_name, output_file_name, time_budget):
+        """Writes settings of a driver program in a JPF session, with
+        its time budget in seconds"""
+
+        output_file = open(output_file_name, 'w')
+
+        output_file.write("# This is an automatically generated configuration file\n\n")
+
+        self.write_driver_settings(output_file, class_name, method_name)
+        self.write_test_generation_settings(output_file, output_file_name)
+        output_file.write("z3.timeout=%i\n" % self.solver_timeout) # milliseconds
+        output_file.write("budget.max_time=%i\n" % (time_budget * 1000))
+
+        output_file.close()
+
+    def write_nhandler_settings(self, output_file):
         if not self.no_nhandler:
             output_file.write("@using jpf-nhandler\n")
             output_file.write("nhandler.delegateUnhandledNative=true\n")
@@ -55,61 +100,45 @@ class GenerateConfFile:
             ))
             output_file.write("\n\n")
 
-        with open(input_file_name, 'r') as f:
-            for line_nl in f:
-                # Remove the newline character
-                line = line_nl[:-1]
-
-                # If this is not a class definition line nor a method
-                # definition line, move on to the next line
-                if not re.search("public class", line) and not re.search("public void", line):
-                    continue
-
-                if re.search("public class", line):
-                    # Extract the class name
-                    class_name = line.lstrip().split(" ")[2]
-                    output_file.write("target=" + self.package_name + "." + class_name + "\n\n")
-                    top_level_class = False
-                    continue
-
-                # Since we got to this point, this is a method definition line
-
-                # Extract the method name
-                method_name = line.lstrip().split(" ")[2].split("(")[0]
-                output_file.write("concolic.method=%s\n" % method_name)
-                output_file.write("concolic.method.%s=%s.%s.%s(%s)\n" % (
-                    method_name,
-                    self.package_name,
-                    class_name,
-                    method_name,
-                    ",".join([
-                        "%s:%s" % (sym_var.split(" ")[1], sym_var.split(" ")[0]) for sym_var in self.sym_var_list])))
-                method_counter += 1
-
-            output_file.write("\n")
-            output_file.write("concolic.values_file=%s\n" % "concrete-values-jdart.txt")
-            output_file.write("\n")
-            output_file.write("classpath+=,%s\n" % self.classpath)
-            output_file.write("\n")
-            if not self.no_nhandler:
-                output_file.write("native_classpath=%s\n" % self.classpath)
-            output_file.write("\n")
-            output_file.write("shell=gov.nasa.jpf.jdart.JDart\n")
-            output_file.write("symbolic.dp=z3\n")
-            output_file.write("z3.timeout=2000\n") # 2000 milliseconds
-            output_file.write("\n")
-            output_file.write("jdart.tests.gen=true\n")
-            output_file.write("jdart.tests.pkg=%s\n" % self.gen_package_name)
-            output_file.write("jdart.tests.dir=%s\n" % self.source_dir)
-            output_file.write("\n")
-            if self.benchmark_id != None:
-                output_file.write("jdart.statistics=%s\n" %
-                                  output_file_name.replace(".jpf", ".csv"))
-                output_file.write("jdart.statistics.id=%s\n\n" % self.benchmark_id)
-
-            # possible log levels: servere, warning, info, config, fine,
-            # finer, finest
-            output_file.write("log.config=jdart\n")
-            output_file.write("log.config=constraints\n")
-
-        output_file.close()
+    def write_driver_settings(self, output_file, class_name, method_name):
+        output_file.write("target=" + self.package_name + "." + class_name + "\n\n")
+
+        output_file.write("concolic.method=%s\n" % method_name)
+        output_file.write("concolic.method.%s=%s.%s.%s(%s)\n" % (
+            method_name,
+            self.package_name,
+            class_name,
+            method_name,
+            ",".join([
+                "%s:%s" % (sym_var.split(" ")[1], sym_var.split(" ")[0]) for sym_var in self.sym_var_list])))
+
+        output_file.write("\n")
+        output_file.write("concolic.values_file=%s\n" % self.values_file)
+        output_file.write("\n")
+
+    def write_jdart_settings(self, output_file):
+        output_file.write("classpath+=,%s\n" % self.classpath)
+        output_file.write("\n")
+        if not self.no_nhandler:
+            output_file.write("native_classpath=%s\n" % self.classpath)
+        output_file.write("\n")
+        output_file.write("shell=gov.nasa.jpf.jdart.JDart\n")
+        output_file.write("symbolic.dp=z3\n")
+        output_file.write("z3.timeout=%i\n" % self.solver_timeout) # milliseconds
+        output_file.write("\n")
+
+    def write_test_generation_settings(self, output_file, output_file_name):
+        output_file.write("jdart.tests.gen=true\n")
+        output_file.write("jdart.tests.pkg=%s\n" % self.gen_package_name)
+        output_file.write("jdart.tests.dir=%s\n" % self.source_dir)
+        output_file.write("\n")
+        if self.benchmark_id != None:
+            output_file.write("jdart.statistics=%s\n" %
+                              output_file_name.replace(".jpf", ".csv"))
+            output_file.write("jdart.statistics.id=%s\n\n" % self.benchmark_id)
+
+    def write_log_settings(self, output_file):
+        # possible log levels: servere, warning, info, config, fine,
+        # finer, finest
+        output_file.write("log.config=jdart\n")
+        output_file.write("log.config=constraints\n")
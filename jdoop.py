@@ -29,19 +29,28 @@ import sets
 import math
 from collections import deque
 import re
+import threading
 
 
 from symbolize_tests import *
 from generate_jpf_files import *
 from command import *
+from jvm_daemon import *
 from report import *
+from budget import *
+from scheduler import *
+from concrete_values import *
+from class_files import *
 
 have_to_finish_by = None
 
 class ClassList:
-    def __init__(self, filename):
+    def __init__(self, filename, class_index = None):
         self.filename = filename
         self.list_of_classes = None
+        # An index of class files to take classes from instead of
+        # source files
+        self.class_index = class_index
 
 
     def get_all_java_source_files(self, base):
@@ -50,6 +59,16 @@ class ClassList:
         if not self.list_of_classes == None:
             return self.list_of_classes
 
+        if self.class_index != None:
+            self.class_index.update()
+            ret = self.class_index.testable_classes()
+            print "Class files: %d, classes Randoop can test: %d" % (
+                len(self.class_index.entries), len(ret))
+            if ret != []:
+                self.list_of_classes = ret
+                return ret
+            print "No class that Randoop can test was found in the class files, listing source files instead"
+
         ret = []
         
         for dirpath, dirnames, filenames in os.walk(base):
@@ -95,7 +114,7 @@ class Paths:
 
 
 class RandoopRun:
-    def __init__(self, unit_tests_name, unit_tests_directory, classlist_filename, timelimit, paths, randoop_only, dont_terminate = False, use_concrete_values = False, seed = 0, dependencies_classpath = None):
+    def __init__(self, unit_tests_name, unit_tests_directory, classlist_filename, timelimit, paths, randoop_only, dont_terminate = False, use_concrete_values = False, seed = 0, dependencies_classpath = None, literals_level = "ALL"):
         self.unit_tests_name = unit_tests_name
         self.unit_tests_directory = unit_tests_directory
         self.classlist_filename = classlist_filename
@@ -106,6 +125,7 @@ class RandoopRun:
         self.randoop_only = randoop_only
         self.seed = seed
         self.dependencies_classpath = dependencies_classpath
+        self.literals_level = literals_level
 
 
     def run(self):
@@ -122,7 +142,7 @@ class RandoopRun:
 
         additional_params = ""
         if self.use_concrete_values and os.path.exists("concrete-values.txt") == True:
-            additional_params = " --literals-file=concrete-values.txt --literals-level=ALL"
+            additional_params = " --literals-file=concrete-values.txt --literals-level=" + self.literals_level
 
         additional_params += " --forbid-null=false --small-tests=true --testsperfile=1 --ignore-flaky-tests"
         additional_params += " --randomseed=%i" % self.seed
@@ -151,9 +171,38 @@ class JDoop:
         self.clock = {}
         self.concrete_values_temporary_file = 'concrete-values-jdart.txt'
 
-        self.concrete_values_all_runs = sets.Set()
+        self.concrete_values_all_runs = ConcreteValues()
         self.concrete_values_all_runs_stats = []
 
+        # Values files of JDart runs by their names, each one read only
+        # as far as it was read last time
+        self.values_files = {}
+
+        # Concrete values with how often and how recently JDart found
+        # them, out of which Randoop gets literals. Configured in the
+        # literals section of the configuration file
+        self.literals_store = LiteralsStore()
+
+        # Which classes Randoop uses literals of a class for: the class
+        # (CLASS), its package (PACKAGE), or all classes (ALL), and the
+        # classes under test that literals are attributed to
+        self.literals_level = "ALL"
+        self.sut_classes = frozenset()
+
+        # How many Randoop processes to run at once, each on a part of
+        # the class list, and whether to split the class list by
+        # package or by size of classes
+        self.randoop_shards = 1
+        self.randoop_shard_by = "package"
+
+        # Literals harvested from class files of the classes under
+        # test, by class, if harvesting is enabled
+        self.harvested_literals = None
+
+        # Splits the time of a round between Randoop and JDart by their
+        # yields when set, otherwise the split is fixed
+        self.phase_budget = None
+
         self.concrete_values_iterations_stats = []
 
         self.compilation_threads = deque()
@@ -167,8 +216,55 @@ class JDoop:
 
         self.prioritize_drivers = False
 
-        with open("jdart-termination-count.txt", 'w') as f:
-            f.write("0")
+        # Number of processes that symbolize unit tests when drivers
+        # are prioritized
+        self.symbolization_workers = 1
+
+        # If positive, drivers are prioritized by a cheap estimate of
+        # their number of symbolic variables, and only this many of
+        # them are ever symbolized in a round
+        self.prescan_top_k = 0
+
+        # Driver programs from earlier rounds and runs, if enabled
+        self.symbolization_cache = None
+
+        # Orders driver programs by what their families yielded so
+        # far, if enabled
+        self.driver_scheduler = None
+
+        # Whether to run JDart on only one of the driver programs
+        # that differ just in names and initial values, and keys of
+        # driver programs JDart was run on
+        self.deduplicate_drivers = False
+        self.driver_keys = sets.Set()
+        self.duplicate_drivers_skipped = 0
+
+        # Number of JDart processes to run concurrently. All state
+        # shared between the workers is guarded by jdart_lock
+        self.jdart_workers = 1
+        self.jdart_lock = threading.Lock()
+
+        # How many driver programs to compile with one javac
+        # invocation. 0 stands for all drivers of a round
+        self.jdart_batch_size = 1
+
+        # How many driver programs to run JDart on in one JPF session,
+        # and the class path of the session launcher once it is built
+        self.jdart_session_size = 1
+        self.jpf_session_classpath = None
+
+        # Chooses time budgets of JDart runs from earlier runs when
+        # set, otherwise every run gets the same budgets
+        self.jdart_budget = None
+
+        # How many seconds a JDart run may go without writing a new
+        # concrete value before it is stopped. 0 disables stopping
+        # runs early
+        self.jdart_stall_window = 0
+
+        for count_filename in [count_file, early_stop_count_file]:
+            with open(count_filename, 'w') as f:
+                f.write("0")
 
 
     def read_config_file(self, params):
@@ -244,16 +340,159 @@ class JDoop:
         else:
             self.paths.lib_jacoco = params.jacoco_path
 
+        # How many and which concrete values Randoop gets is optional
+        # to configure
+        max_values = 0
+        ranking = "decayed-frequency"
+        decay = 0.5
+        max_classes = 10
+        if config.has_section('literals'):
+            try:
+                if config.has_option('literals', 'max-values'):
+                    max_values = config.getint('literals', 'max-values')
+                if config.has_option('literals', 'ranking'):
+                    ranking = str(config.get('literals', 'ranking'))
+                if config.has_option('literals', 'decay'):
+                    decay = config.getfloat('literals', 'decay')
+                if config.has_option('literals', 'max-classes'):
+                    max_classes = config.getint('literals', 'max-classes')
+                self.literals_store = LiteralsStore(max_values, ranking, decay, max_classes)
+            except ValueError, err:
+                sys.exit("Invalid literals settings: %s" % err)
+
 
     def run_randoop(self, unit_tests, classlist, timelimit, dont_terminate = False, use_concrete_values = False, seed = 0):
         """Invokes Randoop"""
 
         if self.randoop_only:
             seed = 0
-        randoop_run = RandoopRun(unit_tests.name, unit_tests.directory, classlist.filename, str(timelimit), self.paths, self.randoop_only, dont_terminate, use_concrete_values, seed, self.dependencies_classpath)
+        if self.randoop_shards > 1:
+            self.run_randoop_shards(unit_tests, classlist, timelimit, dont_terminate, use_concrete_values, seed)
+            return
+        randoop_run = RandoopRun(unit_tests.name, unit_tests.directory, classlist.filename, str(timelimit), self.paths, self.randoop_only, dont_terminate, use_concrete_values, seed, self.dependencies_classpath, self.literals_level)
         randoop_run.run()
 
 
+    def partition_classes(self, classes):
+        """Splits a list of classes into up to randoop_shards parts of
+        about the same size, where the size of a class is the size of
+        its class file. Classes of a package stay together when
+        splitting by package"""
+
+        import heapq
+
+        def class_size(class_name):
+            try:
+                return max(os.path.getsize(os.path.join(
+                    self.paths.sut_compilation_dir,
+                    class_name.replace(".", os.sep) + ".class")), 1)
+            except OSError:
+                return 1
+
+        groups = {}
+        for class_name in classes:
+            if self.randoop_shard_by == "package":
+                key = class_name.rpartition(".")[0]
+            else:
+                key = class_name
+            groups.setdefault(key, []).append(class_name)
+
+        # Give the largest remaining group to the smallest part
+        sized_groups = sorted([(sum([class_size(c) for c in group]), key)
+                               for (key, group) in groups.iteritems()],
+                              reverse=True)
+        parts = [(0, i, []) for i in range(self.randoop_shards)]
+        for (size, key) in sized_groups:
+            (part_size, i, part) = heapq.heappop(parts)
+            part.extend(groups[key])
+            heapq.heappush(parts, (part_size + size, i, part))
+
+        return [part for (part_size, i, part) in sorted(parts, key=lambda p: p[1]) if part != []]
+
+
+    def run_randoop_shards(self, unit_tests, classlist, timelimit, dont_terminate, use_concrete_values, seed):
+        """Runs Randoop processes concurrently, each on a part of the
+        class list with a seed and an output directory of its own, and
+        merges the unit tests they generate into one round"""
+
+        with open(classlist.filename, 'r') as f:
+            classes = [line.strip() for line in f if line.strip() != ""]
+        parts = self.partition_classes(classes)
+
+        shards = []
+        for (i, part) in enumerate(parts):
+            shard_classlist = "%s-shard-%i.txt" % (os.path.splitext(classlist.filename)[0], i)
+            with open(shard_classlist, 'w') as f:
+                f.write("\n".join(part) + "\n")
+            shard_dir = "%s-shard-%i" % (os.path.normpath(unit_tests.directory), i)
+            shard_run = RandoopRun(unit_tests.name, shard_dir, shard_classlist, str(timelimit), self.paths, self.randoop_only, dont_terminate, use_concrete_values, seed * self.randoop_shards + i, self.dependencies_classpath, self.literals_level)
+            shards.append(threading.Thread(target=shard_run.run))
+
+        for shard in shards:
+            shard.start()
+        for shard in shards:
+            shard.join()
+
+        self.merge_randoop_shards(unit_tests, ["%s-shard-%i" % (os.path.normpath(unit_tests.directory), i)
+                                               for i in range(len(parts))])
+
+
+    def merge_randoop_shards(self, unit_tests, shard_dirs, template_filename = None):
+        """Moves unit tests generated by Randoop shards to the directory
+        of the round, numbering them one after another, and writes a
+        suite of all of them in place of Randoop's suite"""
+
+        from string import Template
+
+        if template_filename == None:
+            template_filename = os.path.join(os.path.dirname(os.path.realpath(__file__)), "suite_header.template")
+
+        shutil.rmtree(unit_tests.directory, ignore_errors = True)
+        try:
+            os.makedirs(unit_tests.directory)
+        except:
+            pass
+
+        test_file_prog = re.compile(r"^%s(\d+)\.java$" % re.escape(unit_tests.name))
+        test_name_prog = re.compile(r"\b%s(\d+)\b" % re.escape(unit_tests.name))
+
+        test_classes = []
+        for shard_dir in shard_dirs:
+            try:
+                file_names = os.listdir(shard_dir)
+            except OSError:
+                continue
+            indices = sorted([int(m.group(1)) for m in map(test_file_prog.match, file_names) if m])
+            renumbered = dict([(index, len(test_classes) + i) for (i, index) in enumerate(indices)])
+
+            def rename(m):
+                return "%s%i" % (unit_tests.name, renumbered.get(int(m.group(1)), int(m.group(1))))
+
+            for index in indices:
+                with open(os.path.join(shard_dir, "%s%i.java" % (unit_tests.name, index)), 'r') as f:
+                    text = f.read()
+                class_name = "%s%i" % (unit_tests.name, renumbered[index])
+                with open(os.path.join(unit_tests.directory, class_name + ".java"), 'w') as f:
+                    f.write(test_name_prog.sub(rename, text))
+                test_classes.append(class_name + ".class")
+
+            shutil.rmtree(shard_dir, ignore_errors = True)
+
+        with open(template_filename, 'r') as f:
+            suite_template = Template(f.read())
+        with open(os.path.join(unit_tests.directory, unit_tests.name + ".java"), 'w') as f:
+            f.write(suite_template.substitute(classes = ",\n".join(test_classes), classname = unit_tests.name))
+
+
+    def run_randoop_round(self, unit_tests, classlist, timelimit, seed, clock_label):
+        """Runs Randoop with concrete values from JDart and measures how
+        long it took. Used when Randoop runs in parallel with JDart"""
+
+        self.start_clock(clock_label)
+        self.run_randoop(unit_tests, classlist, timelimit, dont_terminate = True, use_concrete_values = True, seed = seed)
+        self.stop_clock(clock_label)
+
+
     def check_and_split_up_suite(self, unit_tests, n_calls = 500, template_filename = 'suite_header.template'):
         """Splits up the main unit test suite class into several classes with up to n_calls unit test calls"""
 
@@ -338,10 +577,43 @@ class JDoop:
                 "javac -g -d " + self.paths.tests_compilation_dir +
                 " -classpath " + cp + " " + " ".join(source_unit_file_paths) +
                 " " + "%s/%s.java" % (unit_tests_suite.directory,
-                                      unit_tests_suite.name)))
+                                      unit_tests_suite.name)),
+                job = javac_job(
+                    ["-g", "-d", self.paths.tests_compilation_dir,
+                     "-classpath", cp] + source_unit_file_paths +
+                    ["%s/%s.java" % (unit_tests_suite.directory,
+                                     unit_tests_suite.name)]))
             compile_tests_command.run()
 
 
+    def symbolization_job(self, unit_tests, unit_test_index):
+        """Returns arguments to symbolize_unit_test for a unit test"""
+
+        return (unit_tests.randooped_package_name,
+                os.path.join(unit_tests.directory,
+                             unit_tests.name + str(unit_test_index) + '.java'),
+                'test' + str(unit_test_index) + 'Class')
+
+
+    def symbolize(self, unit_tests, unit_test_index):
+        """Turns a unit test into a driver program for JDart, unless the
+        driver program is in the symbolization cache already. Returns
+        None if the driver program has no symbolic variables"""
+
+        job = self.symbolization_job(unit_tests, unit_test_index)
+
+        if self.symbolization_cache == None:
+            return symbolize_unit_test(job)
+
+        key = self.symbolization_cache.key(job[1])
+        (hit, symbolic_unit_test) = self.symbolization_cache.lookup(key, job[0], job[2])
+        if not hit:
+            symbolic_unit_test = symbolize_unit_test(job)
+            self.symbolization_cache.store(key, symbolic_unit_test)
+
+        return symbolic_unit_test
+
+
     def sort_by_num_of_sym_vars(self, unit_tests):
         """Walks over unit tests generated by Randoop, turns them into driver
         programs for JDart, and returns their list sorted in a
@@ -354,34 +626,80 @@ class JDoop:
         unit_tests_list = filter(prog.match, dir_list)
         unit_test_indices = range(len(unit_tests_list))
 
-        candidates = []
+        jobs = [self.symbolization_job(unit_tests, unit_test_index)
+                for unit_test_index in unit_test_indices]
+
+        # Take what we can from the cache and symbolize the rest
+        symbolized = [None] * len(jobs)
+        keys = [None] * len(jobs)
+        misses = []
+        for i in range(len(jobs)):
+            if self.symbolization_cache != None:
+                keys[i] = self.symbolization_cache.key(jobs[i][1])
+                (hit, symbolized[i]) = self.symbolization_cache.lookup(keys[i], jobs[i][0], jobs[i][2])
+                if hit:
+                    continue
+            misses.append(i)
 
-        for unit_test_index in unit_test_indices:
-            class_name = 'test' + str(unit_test_index) + 'Class'
+        if self.symbolization_workers > 1 and len(misses) > 1:
+            import multiprocessing
 
-            symbolic_unit_test = SymbolicUnitTests(
-                unit_tests.randooped_package_name,
-                os.path.join(unit_tests.directory,
-                             unit_tests.name + str(unit_test_index) +'.java'),
-                [class_name])
-            symbolic_unit_test.generate_symbolized_unit_tests()
-
-            # Skip a symbolic test case if it hasn't been written to a
-            # file or if it has no symbolic variables
-            if symbolic_unit_test.wrote_test_case == False or symbolic_unit_test.sym_var_list == []:
-                # Delete this non-needed Java file
-                try:
-                    os.remove(os.path.join(
-                        symbolic_unit_test.path,
-                        symbolic_unit_test.class_name + ".java")
-                    )
-                except:
-                    pass
+            pool = multiprocessing.Pool(self.symbolization_workers)
+            try:
+                results = pool.map(
+                    symbolize_unit_test, [jobs[i] for i in misses],
+                    max(1, len(misses) / (4 * self.symbolization_workers)))
+            finally:
+                pool.terminate()
+        else:
+            results = map(symbolize_unit_test, [jobs[i] for i in misses])
+
+        for (i, symbolic_unit_test) in zip(misses, results):
+            symbolized[i] = symbolic_unit_test
+            if self.symbolization_cache != None:
+                self.symbolization_cache.store(keys[i], symbolic_unit_test)
+
+        # Drivers with no symbolic variables are None
+        candidates = [(symbolic_unit_test, unit_test_index) for
+                      (symbolic_unit_test, unit_test_index) in
+                      zip(symbolized, unit_test_indices)
+                      if symbolic_unit_test != None]
+
+        # Break ties by the unit test index to keep the order
+        # independent of how the work was split up
+        candidates.sort(key=lambda (sym_test, index): (-len(sym_test.sym_var_list), index))
+
+        return [sym_test for (sym_test, index) in candidates]
+
+
+    def prescan_top_unit_tests(self, unit_tests):
+        """Returns indices of up to prescan_top_k unit tests with the most
+        candidate literals in a decreasing order, without symbolizing
+        any of them"""
+
+        import heapq
+
+        dir_list = os.listdir(unit_tests.directory)
+        prog = re.compile(unit_tests.name + "[0-9]+\.java")
+        unit_tests_list = filter(prog.match, dir_list)
+
+        # A min-heap of the best unit tests seen so far. On equal
+        # counts, lower indices are better
+        heap = []
+        for unit_test_index in range(len(unit_tests_list)):
+            count = count_candidate_literals(os.path.join(
+                unit_tests.directory,
+                unit_tests.name + str(unit_test_index) + '.java'))
+            if count == 0:
                 continue
 
-            candidates.append(symbolic_unit_test)
+            item = (count, -unit_test_index)
+            if len(heap) < self.prescan_top_k:
+                heapq.heappush(heap, item)
+            elif item > heap[0]:
+                heapq.heapreplace(heap, item)
 
-        return sorted(candidates, key=lambda sym_test: -len(sym_test.sym_var_list))
+        return [-index for (count, index) in sorted(heap, reverse=True)]
 
 
     def shuffle_unit_tests(self, unit_tests):
@@ -398,95 +716,545 @@ class JDoop:
         return unit_test_indices
 
 
-    def run_driver_with_jdart(self, symbolic_unit_test, package_name, classpath, compile_cp, finish_time):
-        """Runs JDart on a driver program, i.e. a symbolic unit test"""
+    def symbolic_drivers(self, unit_tests, finish_time):
+        """Yields driver programs for JDart, one at a time, until the
+        time limit is reached. Unit tests that don't give a driver
+        with symbolic variables are skipped"""
+
+        if self.driver_scheduler != None:
+            # All driver programs have to be known up front to put
+            # them in families
+            for symbolic_unit_test in self.driver_scheduler.schedule(self.sort_by_num_of_sym_vars(unit_tests)):
+                # Exit if we already reached the timelimit
+                if time.time() >= finish_time:
+                    return
+
+                yield symbolic_unit_test
+
+            return
+
+        if self.prioritize_drivers and self.prescan_top_k > 0:
+            # Symbolize a driver only right before it goes to JDart
+            for unit_test_index in self.prescan_top_unit_tests(unit_tests):
+                # Exit if we already reached the timelimit
+                if time.time() >= finish_time:
+                    return
+
+                symbolic_unit_test = self.symbolize(unit_tests, unit_test_index)
+                if symbolic_unit_test != None:
+                    yield symbolic_unit_test
+
+            return
+
+        if self.prioritize_drivers:
+            for symbolic_unit_test in self.sort_by_num_of_sym_vars(unit_tests):
+                # Exit if we already reached the timelimit
+                if time.time() >= finish_time:
+                    return
+
+                yield symbolic_unit_test
+
+            return
+
+        for unit_test_index in self.shuffle_unit_tests(unit_tests):
+            # Exit if we already reached the timelimit
+            if time.time() >= finish_time:
+                return
+
+            # Skip a unit test if it has no symbolic variables
+            symbolic_unit_test = self.symbolize(unit_tests, unit_test_index)
+            if symbolic_unit_test == None:
+                continue
+
+            yield symbolic_unit_test
+
+
+    def distinct_drivers(self, drivers):
+        """Yields driver programs that are structurally different from
+        all driver programs JDart was run on in earlier rounds and from
+        all driver programs yielded before in this round. A key becomes
+        known to later rounds only once a JDart run on its driver
+        program is collected, so driver programs that are yielded but
+        not run before the round ends get another chance"""
+
+        # Keys of driver programs yielded in this round
+        pending = sets.Set()
+        for symbolic_unit_test in drivers:
+            key = canonical_driver_key(symbolic_unit_test)
+            if key in self.driver_keys or key in pending:
+                self.duplicate_drivers_skipped += 1
+                continue
+
+            pending.add(key)
+            symbolic_unit_test.key = key
+            yield symbolic_unit_test
+
+
+    def compile_drivers(self, symbolic_unit_tests, compile_cp):
+        """Writes driver programs to the disk, compiles them with a
+        single javac invocation, and returns those driver programs
+        that compiled"""
+
+        try:
+            os.makedirs(self.paths.tests_compilation_dir)
+        except:
+            pass
+
+        to_compile = {}
+        for symbolic_unit_test in symbolic_unit_tests:
+            whole_path = symbolic_unit_test.write()
+            to_compile[os.path.normpath(whole_path)] = symbolic_unit_test
+
+        error_prog = re.compile("^(.*\.java):[0-9]+: error", re.MULTILINE)
+
+        # javac doesn't write any class files if one of the source
+        # files has an error, so drop the failing drivers and try
+        # again with the rest
+        while to_compile:
+            compile_tests_command = Command(args = "javac -g -d " +
+                                            self.paths.tests_compilation_dir
+                                            + " -classpath " +
+                                            compile_cp + " " +
+                                            " ".join(sorted(to_compile.keys())),
+                                            capture_stderr = True,
+                                            job = javac_job(
+                                                ["-g", "-d", self.paths.tests_compilation_dir,
+                                                 "-classpath", compile_cp] +
+                                                sorted(to_compile.keys())))
+            compile_tests_command.run()
+
+            if compile_tests_command.returncode == 0:
+                break
+
+            failed = sets.Set([os.path.normpath(path) for path in
+                               error_prog.findall(compile_tests_command.stderr)])
+            failed.intersection_update(to_compile.keys())
+            if len(failed) == 0:
+                # The failure can't be attributed to any driver
+                return []
+
+            for path in failed:
+                sys.stderr.write("Skipping driver %s as it doesn't compile\n" % path)
+                del to_compile[path]
+
+        compiled = sets.Set(to_compile.values())
+        return [sym_test for sym_test in symbolic_unit_tests
+                if sym_test in compiled]
+
+
+    def compiled_drivers(self, drivers, compile_cp, finish_time):
+        """Yields driver programs that were compiled in batches of
+        jdart_batch_size drivers until the time limit is reached"""
+
+        while True:
+            batch = []
+            for symbolic_unit_test in drivers:
+                batch.append(symbolic_unit_test)
+                if len(batch) == self.jdart_batch_size:
+                    break
+
+            if batch == []:
+                return
+
+            for symbolic_unit_test in self.compile_drivers(batch, compile_cp):
+                # Exit if we already reached the timelimit
+                if time.time() >= finish_time:
+                    return
+
+                yield symbolic_unit_test
+
+
+    def jdart_sessions(self, drivers, finish_time):
+        """Yields lists of up to jdart_session_size driver programs to
+        run JDart on in one JPF session until the time limit is
+        reached"""
+
+        while time.time() < finish_time:
+            session = []
+            for symbolic_unit_test in drivers:
+                session.append(symbolic_unit_test)
+                if len(session) == self.jdart_session_size:
+                    break
+
+            if session == []:
+                return
+
+            yield session
+
+
+    def build_jpf_session(self, script_dir):
+        """Compiles the launcher of JPF sessions with many driver
+        programs. Returns whether it is ready to be used"""
+
+        build_dir = os.path.join("build", "jpf-session")
+        try:
+            os.makedirs(build_dir)
+        except:
+            pass
+
+        run_jpf = os.path.join(self.jpf_core_path, "build", "RunJPF.jar")
+        source = os.path.join(script_dir, "jpf-session", "JDoopJPFSession.java")
+        compile_command = Command(args = "javac -d %s -classpath %s %s" % (build_dir, run_jpf, source),
+                                  job = javac_job(["-d", build_dir, "-classpath", run_jpf, source]))
+        compile_command.run()
+        if compile_command.returncode != 0:
+            return False
+
+        self.jpf_session_classpath = run_jpf + ":" + os.path.abspath(build_dir)
+        return True
+
+
+    def run_jdart_workers(self, drivers, unit_tests, classpath, compile_cp, finish_time, concrete_values_iteration, concrete_values_iteration_stats):
+        """Runs JDart on driver programs with a pool of concurrent
+        workers. Each worker has its own scratch directory with its
+        own concrete values file, and its values are merged into the
+        global set as soon as a JDart run finishes"""
+
+        drivers_lock = threading.Lock()
+
+        def worker(worker_id):
+            scratch_dir = "jdart-worker-%i" % worker_id
+            try:
+                os.makedirs(scratch_dir)
+            except:
+                pass
+            values_file = os.path.abspath(os.path.join(
+                scratch_dir, self.concrete_values_temporary_file))
+
+            while True:
+                # A generator can't be advanced from two threads at
+                # once, so take one driver (or session) at a time
+                with drivers_lock:
+                    try:
+                        symbolic_unit_test = next(drivers)
+                    except StopIteration:
+                        return
+
+                if self.jdart_session_size > 1:
+                    runs = self.run_session_with_jdart(symbolic_unit_test, unit_tests.randooped_package_name, classpath, compile_cp, finish_time, scratch_dir)
+                else:
+                    outcome = self.run_driver_with_jdart(symbolic_unit_test, unit_tests.randooped_package_name, classpath, compile_cp, finish_time, values_file)
+                    runs = [(symbolic_unit_test, values_file, outcome)]
+
+                with self.jdart_lock:
+                    for (symbolic_unit_test, values_file, outcome) in runs:
+                        self.collect_jdart_run(unit_tests.name, symbolic_unit_test, values_file, outcome, concrete_values_iteration, concrete_values_iteration_stats)
+
+        workers = [threading.Thread(target=worker, args=(worker_id,))
+                   for worker_id in range(self.jdart_workers)]
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join()
+
+
+    def jdart_budgets(self, symbolic_unit_test):
+        """Returns a pair of a JDart timeout in seconds and a Z3 timeout
+        in milliseconds for a driver program"""
+
+        if self.jdart_budget == None:
+            return (JDartBudget.DEFAULT_TIMEOUT, JDartBudget.DEFAULT_SOLVER_TIMEOUT)
+
+        budgets = self.jdart_budget.budgets(len(symbolic_unit_test.sym_var_list))
+        sys.stderr.write("JDart budgets for %s: %d s, Z3 %d ms\n" % (
+            (symbolic_unit_test.class_name,) + budgets))
+        return budgets
+
+
+    def run_driver_with_jdart(self, symbolic_unit_test, package_name, classpath, compile_cp, finish_time, values_file = None):
+        """Runs JDart on a driver program, i.e. a symbolic unit test. The
+        driver program is written to the disk and compiled first
+        unless it was compiled in a batch already. Returns the
+        outcome of the run: its timeout and Z3 timeout, how long it
+        took, whether it timed out, whether it was stopped early for
+        not finding new concrete values, and whether its timeout was
+        cut short to end by the end of the round. A run stopped early
+        didn't time out"""
+
+        if values_file == None:
+            values_file = self.concrete_values_temporary_file
+
+        (timeout, solver_timeout) = self.jdart_budgets(symbolic_unit_test)
+
+        # Reserve a package for tests that JDart generates from this
+        # driver program
+        with self.jdart_lock:
+            darted_index = self.darted_count
+            self.darted_count += 1
+
+        # Compile the symbolic test, i.e. the driver program
+        if self.jdart_batch_size == 1:
+            whole_path = symbolic_unit_test.write()
+            try:
+                os.makedirs(self.paths.tests_compilation_dir)
+            except:
+                pass
+            compile_tests_command = Command(args = "javac -g -d " +
+                                            self.paths.tests_compilation_dir
+                                            + " -classpath " +
+                                            compile_cp + " " +
+                                            whole_path,
+                                            job = javac_job(
+                                                ["-g", "-d", self.paths.tests_compilation_dir,
+                                                 "-classpath", compile_cp, whole_path]))
+            compile_tests_command.run()
 
         # Generate a JPF configuration file (.jpf) for this symbolic
         # driver program
-        whole_path = os.path.join(
-            package_name.replace(".", os.sep),
-            symbolic_unit_test.class_name + ".java")
+        whole_path = symbolic_unit_test.file_path(".jpf")
         jpf_file = GenerateConfFile(
             package_name,
             classpath,
-            "darted%i" % self.darted_count,
+            "darted%i" % darted_index,
             "darted",
             symbolic_unit_test.sym_var_list,
             self.benchmark_id,
-            self.no_nhandler
+            self.no_nhandler,
+            values_file,
+            solver_timeout
         )
-        self.darted_count += 1
         jpf_file.generate_jpf_conf_file(
-            whole_path,
-            whole_path.replace(".java", ".jpf"))
-
-        # Compile the symbolic test, i.e. the driver program
-        try:
-            os.makedirs(self.paths.tests_compilation_dir)
-        except:
-            pass
-        compile_tests_command = Command(args = "javac -g -d " +
-                                        self.paths.tests_compilation_dir
-                                        + " -classpath " +
-                                        compile_cp + " " +
-                                        whole_path)
-        compile_tests_command.run()
-
-        # Run JDart on the driver program
-        whole_path = whole_path.replace(".java", ".jpf")
-
-        jdart = CommandWithTimeout(args=os.path.join(self.jpf_core_path, "bin/jpf") + " " + whole_path)
-        timeout = max(min(20, math.ceil(finish_time - time.time())), 1)
+            symbolic_unit_test.class_name,
+            symbolic_unit_test.method_name,
+            whole_path)
+
+        # Run JDart on the driver program. A run that stops finding
+        # concrete values is stopped early, which leaves the rest of
+        # its time to the next driver programs of the round
+
+        stall_detector = None
+        if self.jdart_stall_window > 0:
+            stall_detector = StallDetector(values_file, self.jdart_stall_window)
+        # JDart always gets a process of its own: every run loads the
+        # Z3 native library, which only one class loader of the JVM
+        # daemon could ever load
+        jdart = CommandWithTimeout(
+            args=os.path.join(self.jpf_core_path, "bin/jpf") + " " + whole_path,
+            stall_detector=stall_detector)
+        deadline_timeout = max(min(timeout, math.ceil(finish_time - time.time())), 1)
+        deadline_cut = deadline_timeout < timeout
+        timeout = deadline_timeout
         sys.stdout.flush()
         sys.stderr.flush()
         sys.stderr.write("Starting JDart on %s\n" % whole_path)
         sys.stderr.write("Number of symbolic variables: %d\n" % len(symbolic_unit_test.sym_var_list))
+        start_time = time.time()
         jdart.run(timeout)
 
+        return (timeout, solver_timeout, time.time() - start_time, jdart.timed_out, jdart.stopped_early, deadline_cut)
 
-    def collect_stats_concrete_values(self, unit_tests_name, concrete_values_iteration, concrete_values_iteration_stats):
-        """Collects statistics about concrete values that JDart produced"""
 
-        collected_values = sets.Set()
+    def run_session_with_jdart(self, symbolic_unit_tests, package_name, classpath, compile_cp, finish_time, scratch_dir):
+        """Runs JDart on driver programs in one JPF session. Every
+        driver program gets a slice of the remaining time and a values
+        file of its own in the scratch directory. Returns a list of
+        (driver program, values file, outcome) triples, where an
+        outcome is as in run_driver_with_jdart. The session reports
+        how long JDart took on each driver program; a driver program
+        it didn't finish, because the session was killed, has no
+        elapsed time (None)"""
+
         try:
-            with open(self.concrete_values_temporary_file, 'r') as f:
-                for line in f:
-                    if ":" in line:
-                        collected_values.add(line[:-1])
+            os.makedirs(scratch_dir)
+        except:
+            pass
+
+        if self.jdart_batch_size == 1:
+            symbolic_unit_tests = self.compile_drivers(symbolic_unit_tests, compile_cp)
+        if symbolic_unit_tests == []:
+            return []
+
+        remaining_time = finish_time - time.time()
+        if self.jdart_budget == None:
+            time_slice = max(min(JDartBudget.DEFAULT_TIMEOUT, math.ceil(remaining_time / len(symbolic_unit_tests))), 1)
+            budgets = [(time_slice, JDartBudget.DEFAULT_SOLVER_TIMEOUT)] * len(symbolic_unit_tests)
+            deadline_cuts = [time_slice < JDartBudget.DEFAULT_TIMEOUT] * len(symbolic_unit_tests)
+        else:
+            budgets = [self.jdart_budgets(symbolic_unit_test)
+                       for symbolic_unit_test in symbolic_unit_tests]
+            deadline_cuts = [False] * len(symbolic_unit_tests)
+            # Shrink the budgets proportionally to fit in the
+            # remaining time
+            total_time = sum([timeout for (timeout, solver_timeout) in budgets])
+            if total_time > remaining_time:
+                shrunk = [(max(int(timeout * remaining_time / total_time), 1), solver_timeout)
+                          for (timeout, solver_timeout) in budgets]
+                deadline_cuts = [new[0] < old[0] for (new, old) in zip(shrunk, budgets)]
+                budgets = shrunk
+
+        session_file = os.path.abspath(os.path.join(scratch_dir, "jdart-session.jpf"))
+        GenerateConfFile(
+            package_name,
+            classpath,
+            None,
+            "darted",
+            [],
+            self.benchmark_id,
+            self.no_nhandler
+        ).generate_session_conf_file(session_file)
+
+        driver_files = []
+        runs = []
+        for (symbolic_unit_test, (timeout, solver_timeout), deadline_cut) in zip(symbolic_unit_tests, budgets, deadline_cuts):
+            values_file = os.path.abspath(os.path.join(
+                scratch_dir, "%s-%s" % (symbolic_unit_test.class_name,
+                                        self.concrete_values_temporary_file)))
+
+            # Reserve a package for tests that JDart generates from
+            # this driver program. Driver class names repeat across
+            # rounds, so the values file is started afresh, and so is
+            # its reader, which could otherwise take a new file in
+            # the same inode for the old one and skip its first lines
+            with self.jdart_lock:
+                darted_index = self.darted_count
+                self.darted_count += 1
+                self.values_files.pop(values_file, None)
+            try:
+                os.remove(values_file)
+            except:
+                pass
+
+            whole_path = symbolic_unit_test.file_path(".jpf")
+            GenerateConfFile(
+                package_name,
+                classpath,
+                "darted%i" % darted_index,
+                "darted",
+                symbolic_unit_test.sym_var_list,
+                self.benchmark_id,
+                self.no_nhandler,
+                values_file,
+                solver_timeout
+            ).generate_driver_conf_file(
+                symbolic_unit_test.class_name,
+                symbolic_unit_test.method_name,
+                whole_path,
+                timeout)
+
+            driver_files.append(whole_path)
+            runs.append((symbolic_unit_test, values_file, (timeout, solver_timeout, None, None, False, deadline_cut)))
+
+        # Times of driver programs from an earlier session would get
+        # mixed in
+        times_file = os.path.abspath(os.path.join(scratch_dir, "jdart-session-times.txt"))
+        try:
+            os.remove(times_file)
         except:
             pass
 
-        print "Collected values: " + str(collected_values)
-        print "Global set before adding these values: " + str(self.concrete_values_all_runs)
+        args = ["-times", times_file, session_file] + driver_files
+        jdart = CommandWithTimeout(
+            args=" ".join(["java"] + os.environ.get("JVM_FLAGS", "").split() +
+                          ["-cp", self.jpf_session_classpath, "JDoopJPFSession"] + args))
+        sys.stdout.flush()
+        sys.stderr.flush()
+        session_time = sum([timeout for (timeout, solver_timeout) in budgets])
+        sys.stderr.write("Starting a JDart session on %d drivers for up to %d seconds\n" % (len(symbolic_unit_tests), session_time))
+        # Every driver program stops on its own once its budget is
+        # spent, so the timeout only covers a session that hangs
+        jdart.run(session_time + 10)
+
+        times = {}
+        try:
+            with open(times_file, 'r') as f:
+                for line in f:
+                    (driver_file, _, seconds) = line.rstrip("\n").rpartition("\t")
+                    times[driver_file] = float(seconds)
+        except (IOError, ValueError):
+            pass
+
+        # JPF stops JDart once a driver program's budget is spent, so
+        # a driver program that took all of it is taken to have timed
+        # out
+        timed_runs = []
+        for ((symbolic_unit_test, values_file, (timeout, solver_timeout, elapsed, timed_out, stopped_early, deadline_cut)), whole_path) in zip(runs, driver_files):
+            elapsed = times.get(whole_path)
+            if elapsed != None:
+                timed_out = elapsed >= timeout
+            timed_runs.append((symbolic_unit_test, values_file, (timeout, solver_timeout, elapsed, timed_out, stopped_early, deadline_cut)))
+
+        return timed_runs
+
+
+    def collect_stats_concrete_values(self, unit_tests_name, concrete_values_iteration, concrete_values_iteration_stats, values_file = None):
+        """Collects statistics about concrete values that JDart
+        produced. Returns how many values were collected and how many
+        of them are new to the global set"""
+
+        if values_file == None:
+            values_file = self.concrete_values_temporary_file
+
+        # Only lines appended to the file since it was last read can
+        # be new; the rest of the file is in the global set already
+        if values_file not in self.values_files:
+            self.values_files[values_file] = ValuesFile(values_file)
+        collected_values = self.values_files[values_file]
+        read_values = collected_values.read()
 
         # Measure a contribution of the just read values to the global
         # set concrete_values_all_runs
-        before_size = len(self.concrete_values_all_runs)
-        self.concrete_values_all_runs.update(collected_values)
-        after_size  = len(self.concrete_values_all_runs)
+        new_values = self.concrete_values_all_runs.update(read_values)
 
-        print "Global set after adding these values:  " + str(self.concrete_values_all_runs)
+        print "Collected values: %d, read: %d, new to the global set of %d: %d" % (
+            len(collected_values.lines), len(read_values),
+            len(self.concrete_values_all_runs), new_values)
+        if read_values != []:
+            print "Read values: " + ", ".join(read_values)
 
         # Insert size of the collected_values set and its
         # contribution to the global set concrete_values_all_runs
-        self.concrete_values_all_runs_stats.append([len(collected_values), after_size - before_size, unit_tests_name])
+        self.concrete_values_all_runs_stats.append([len(collected_values.lines), new_values, unit_tests_name])
 
         # Measure a contribution of the just read values to the local
-        # set concrete_values_iteration
-        before_size = len(concrete_values_iteration)
-        concrete_values_iteration.update(collected_values)
-        after_size  = len(concrete_values_iteration)
+        # set concrete_values_iteration. Values read from the file in
+        # earlier iterations have to be merged into this one once
+        if collected_values.merged_into is concrete_values_iteration:
+            iteration_new_values = concrete_values_iteration.update(read_values)
+        else:
+            iteration_new_values = concrete_values_iteration.update(collected_values.lines)
+            collected_values.merged_into = concrete_values_iteration
 
         # Insert size of the collected_values set and its
         # contribution to the global set concrete_values
-        concrete_values_iteration_stats.append([len(collected_values),
-                                                after_size - before_size])
+        concrete_values_iteration_stats.append([len(collected_values.lines),
+                                                iteration_new_values])
+
+        return (len(collected_values.lines), new_values)
+
+
+    def collect_jdart_run(self, unit_tests_name, symbolic_unit_test, values_file, outcome, concrete_values_iteration, concrete_values_iteration_stats):
+        """Collects concrete values from a JDart run on a driver program
+        and tells the literals store, the budget controller and the
+        driver scheduler how the run went"""
+
+        if values_file == None:
+            values_file = self.concrete_values_temporary_file
+
+        (collected, new_values) = self.collect_stats_concrete_values(unit_tests_name, concrete_values_iteration, concrete_values_iteration_stats, values_file)
+
+        if symbolic_unit_test.key != None:
+            self.driver_keys.add(symbolic_unit_test.key)
+
+        self.literals_store.record(self.values_files[values_file].appended,
+                                   symbolic_unit_test.class_name,
+                                   exercised_classes(symbolic_unit_test, self.sut_classes))
+
+        (timeout, solver_timeout, elapsed, timed_out, stopped_early, deadline_cut) = outcome
+
+        if self.jdart_budget != None:
+            self.jdart_budget.record(unit_tests_name, symbolic_unit_test.class_name, len(symbolic_unit_test.sym_var_list), timeout, solver_timeout, elapsed, timed_out, stopped_early, deadline_cut, collected, new_values)
+
+        if self.driver_scheduler != None:
+            # A driver program in a JPF session that was killed took
+            # at most its time budget
+            if elapsed == None:
+                elapsed = timeout
+            self.driver_scheduler.record(symbolic_unit_test, elapsed, new_values)
 
 
     def run_jdart_loop(self, unit_tests, root_dir, classlist, timelimit, concrete_values_file_name = 'concrete-values.txt', template_filename = 'randoop-format.template'):
         """Calls JDart on the symbolized unit tests and collects concrete values used in the concolic execution"""
 
-        from string import Template
         import re, random
 
         # Write down the time when the method started executing and
@@ -494,9 +1262,12 @@ class JDoop:
         # terminate
         finish_time = time.time() + timelimit
 
-        concrete_values_iteration = sets.Set()
+        concrete_values_iteration = ConcreteValues()
         concrete_values_iteration_stats = []
         global_before_size = len(self.concrete_values_all_runs)
+        self.literals_store.start_round(unit_tests.name)
+        all_classes = classlist.get_all_java_source_files(root_dir)
+        self.sut_classes = frozenset(all_classes)
 
 
         classpath = ""
@@ -519,54 +1290,25 @@ class JDoop:
             os.path.join(self.jdart_path, "build/annotations/"),
             self.paths.tests_compilation_dir])
 
-        if self.prioritize_drivers:
-            symbolic_unit_tests = self.sort_by_num_of_sym_vars(unit_tests)
-
-            for symbolic_unit_test in symbolic_unit_tests:
-                # Write down the current time
-                current_time = time.time()
-                # Exit if we already reached the timelimit
-                if current_time >= finish_time:
-                    break
-
-                self.run_driver_with_jdart(symbolic_unit_test, unit_tests.randooped_package_name, classpath, compile_cp, finish_time)
-
-                self.collect_stats_concrete_values(unit_tests.name, concrete_values_iteration, concrete_values_iteration_stats)
-
+        drivers = self.symbolic_drivers(unit_tests, finish_time)
+        if self.deduplicate_drivers:
+            drivers = self.distinct_drivers(drivers)
+        if self.jdart_batch_size != 1:
+            drivers = self.compiled_drivers(drivers, compile_cp, finish_time)
+        if self.jdart_session_size > 1:
+            drivers = self.jdart_sessions(drivers, finish_time)
+
+        if self.jdart_workers > 1:
+            self.run_jdart_workers(drivers, unit_tests, classpath, compile_cp, finish_time, concrete_values_iteration, concrete_values_iteration_stats)
+        elif self.jdart_session_size > 1:
+            for session in drivers:
+                for (symbolic_unit_test, values_file, outcome) in self.run_session_with_jdart(session, unit_tests.randooped_package_name, classpath, compile_cp, finish_time, "jdart-worker-0"):
+                    self.collect_jdart_run(unit_tests.name, symbolic_unit_test, values_file, outcome, concrete_values_iteration, concrete_values_iteration_stats)
         else:
-            shuffled_unit_tests = self.shuffle_unit_tests(unit_tests)
-
-            for unit_test_index in shuffled_unit_tests:
-                # Write down the current time
-                current_time = time.time()
-                # Exit if we already reached the timelimit
-                if current_time >= finish_time:
-                    break
-
-                class_name = 'test' + str(unit_test_index) + 'Class'
+            for symbolic_unit_test in drivers:
+                outcome = self.run_driver_with_jdart(symbolic_unit_test, unit_tests.randooped_package_name, classpath, compile_cp, finish_time)
 
-                symbolic_unit_test = SymbolicUnitTests(
-                    unit_tests.randooped_package_name,
-                    os.path.join(unit_tests.directory, unit_tests.name
-                                 + str(unit_test_index) +'.java'), [class_name])
-                symbolic_unit_test.generate_symbolized_unit_tests()
-
-                # Skip a symbolic test case if it hasn't been written
-                # to a file or if it has no symbolic variables
-                if symbolic_unit_test.wrote_test_case == False or symbolic_unit_test.sym_var_list == []:
-                    # Delete this non-needed Java file
-                    try:
-                        os.remove(os.path.join(
-                            symbolic_unit_test.path,
-                            symbolic_unit_test.class_name + ".java")
-                        )
-                    except:
-                        pass
-                    continue
-
-                self.run_driver_with_jdart(symbolic_unit_test, unit_tests.randooped_package_name, classpath, compile_cp, finish_time)
-
-                self.collect_stats_concrete_values(unit_tests.name, concrete_values_iteration, concrete_values_iteration_stats)
+                self.collect_jdart_run(unit_tests.name, symbolic_unit_test, None, outcome, concrete_values_iteration, concrete_values_iteration_stats)
 
 
         # Collect information on contribution of this iteration to
@@ -581,16 +1323,55 @@ class JDoop:
         global_after_size = len(self.concrete_values_all_runs)
         self.concrete_values_iterations_stats.append([len(concrete_values_iteration), global_after_size - global_before_size, unit_tests.name])
 
-        # Read a template for the Randoop format from the file
-        randoop_template_str = ''
+        # Write the best ranked unique concrete values back to the
+        # concrete values file, with the values of each class under
+        # test in a block of their own, together with literals
+        # harvested from class files
+        literals = self.literals_store.export()
+        (exported, evicted, _) = self.literals_store.export_stats[-1]
+        print "Literals for Randoop: %d, evicted: %d" % (exported, evicted)
+        class_literals = self.literals_store.by_class(literals, all_classes, self.literals_level)
+        if self.harvested_literals != None:
+            for (c, harvested) in self.harvested_literals.iteritems():
+                values = class_literals.setdefault(c, [])
+                known_values = set(values)
+                values.extend([value for value in harvested if value not in known_values])
+        if not class_literals:
+            class_literals = {all_classes[0]: []}
+        self.write_literals_file(class_literals, concrete_values_file_name, template_filename)
+
+
+    def write_literals_file(self, class_literals, concrete_values_file_name, template_filename):
+        """Writes literals of classes to a file in Randoop's format, with
+        a block per class. Randoop might be starting up at the same
+        time, so the file is replaced in one step instead of being
+        rewritten in place"""
+
+        from string import Template
+
         with open(template_filename, 'r') as f:
-            randoop_template_str = f.read()
+            randoop_template = Template(f.read())
 
-        randoop_template = Template(randoop_template_str)
+        with open(concrete_values_file_name + ".tmp", 'w') as f:
+            f.write("".join([randoop_template.substitute(classname = c, values = "\n".join(values))
+                             for (c, values) in class_literals.iteritems()]))
+        os.rename(concrete_values_file_name + ".tmp", concrete_values_file_name)
 
-        # Write unique concrete values back to the concrete values file
-        with open(concrete_values_file_name, 'w') as f:
-            f.write(randoop_template.substitute(classname = classlist.get_all_java_source_files(root_dir)[0], values = "\n".join(self.concrete_values_all_runs)))
+
+    def harvest_literals(self, classlist, root_dir, concrete_values_file_name = 'concrete-values.txt', template_filename = 'randoop-format.template'):
+        """Harvests literals from class files of the classes under test
+        and writes them to the concrete values file, so that Randoop
+        has literals to use before JDart finds any"""
+
+        start_time = time.time()
+        self.harvested_literals = harvest_literals(
+            self.paths.sut_compilation_dir,
+            classlist.get_all_java_source_files(root_dir))
+        print "Harvested %d literals of %d classes from class files in %.2lf s" % (
+            sum([len(values) for values in self.harvested_literals.itervalues()]),
+            len(self.harvested_literals), time.time() - start_time)
+        if self.harvested_literals:
+            self.write_literals_file(self.harvested_literals, concrete_values_file_name, template_filename)
 
 
     def collect_darted_suites(self):
@@ -761,6 +1542,38 @@ class JDoop:
         for c in jdoop.clock.iterkeys():
             jdoop.print_clock(c)
 
+        if self.phase_budget != None:
+            for (round_name, randoop_time, jdart_time, randoop_yield, jdart_yield) in self.phase_budget.decisions:
+                print "Budgets after %s: Randoop %d s, JDart %d s (yields: %.2f tests/s, %.2f values/s)" % (
+                    round_name, randoop_time, jdart_time, randoop_yield, jdart_yield)
+
+        if self.deduplicate_drivers:
+            print "Duplicate drivers skipped: %d" % self.duplicate_drivers_skipped
+
+        if self.symbolization_cache != None:
+            print "Symbolization cache: %d hits, %d misses, %d evictions" % (
+                self.symbolization_cache.hits,
+                self.symbolization_cache.misses,
+                self.symbolization_cache.evictions)
+
+        if self.jdart_stall_window > 0:
+            print "JDart runs stopped early: %d (timeouts: %d)" % (
+                read_count(early_stop_count_file), read_count(count_file))
+
+        if self.driver_scheduler != None:
+            print "Most productive driver families (runs, seconds, new values):"
+            for (family, runs, seconds, new_values) in self.driver_scheduler.top_families():
+                print "  %s: %d, %.1f, %d" % (family, runs, seconds, new_values)
+
+    def rebalance_budgets(self, round_name):
+        """Splits the time of the next round between Randoop and JDart
+        by how much they yielded so far"""
+
+        (self.randoop_time, self.jdart_time) = self.phase_budget.rebalance(round_name)
+        print "Budgets after %s: Randoop %d s, JDart %d s" % (
+            round_name, self.randoop_time, self.jdart_time)
+
+
     def determine_timelimit(self, identifier):
         """Determine how much time can and should be spent for a particular task given a global time limit and time left"""
 
@@ -797,14 +1610,38 @@ if __name__ == "__main__":
     parser.add_argument('--timelimit', default=120, type=int, help='Timelimit in seconds in which JDoop should finish its execution')
     parser.add_argument('--randoop-time', default=540, type=int, help='How much time per round should be given to Randoop')
     parser.add_argument('--jdart-time', default=60, type=int, help='How much time per round should be given to Jdart')
+    parser.add_argument('--rebalance-budgets', default=False, action="store_true", help='Shift time of a round between Randoop and JDart toward the one that yielded more lately, keeping the sum of --randoop-time and --jdart-time')
+    parser.add_argument('--min-randoop-share', default=0.2, type=float, help='The smallest share of a round that Randoop gets with --rebalance-budgets')
+    parser.add_argument('--max-randoop-share', default=0.9, type=float, help='The largest share of a round that Randoop gets with --rebalance-budgets')
     parser.add_argument('--configuration-file', default='jdoop.ini', help='A configuration file with settings for JDoop')
     parser.add_argument('--randoop-only', default=False, action="store_true", help='The tool should run Randoop only')
     parser.add_argument('--baseline', default=False, action="store_true", help='The tool should run in the baseline mode')
     parser.add_argument('--classpath', default=None, help='A classpath to dependencies of tested classes')
     parser.add_argument('--generate-report', default=False, action="store_true", help='The tool should generate a code coverage report once it finishes its execution')
+    parser.add_argument('--single-jvm-coverage', default=False, action="store_true", help='Run all unit tests in one JVM when measuring code coverage')
+    parser.add_argument('--coverage-shards', default=1, type=int, help='Number of JVMs to run unit tests in parallel when measuring code coverage')
     parser.add_argument('--jdart-coverage-only', default=False, action="store_true", help='The tool should measure code coverage of JDart test cases only')
     parser.add_argument('--prioritize-drivers', default=False, action="store_true", help='Prioritize drivers with more symbolic variables')
+    parser.add_argument('--symbolization-workers', default=1, type=int, help='Number of processes that symbolize unit tests with --prioritize-drivers')
+    parser.add_argument('--prescan-top-k', default=0, type=int, help='With --prioritize-drivers, rank unit tests by a cheap count of their literals and symbolize only the top K of them, right before running JDart')
+    parser.add_argument('--symbolization-cache', default=None, help='A file to keep driver programs in across rounds and runs')
+    parser.add_argument('--symbolization-cache-size', default=10000, type=int, help='Maximum number of driver programs in the symbolization cache')
+    parser.add_argument('--bandit-scheduler', default=None, choices=['class', 'method'], help='Order drivers by how many new concrete values per second drivers that target the same class or method have found so far')
+    parser.add_argument('--deduplicate-drivers', default=False, action="store_true", help='Run JDart on only one of driver programs that differ just in names and literals that were made symbolic')
     parser.add_argument('--no-nhandler', default=False, action="store_true", help='Disable using jpf-nhandler')
+    parser.add_argument('--pipeline', default=False, action="store_true", help='Run Randoop for the next round in parallel with JDart instead of alternating the two. Each keeps its own time limit')
+    parser.add_argument('--jvm-daemon', default=None, choices=['java', 'stand-in'], help='Run javac in a long-lived JVM (or in a stand-in server that starts a process per job). JPF, JDart and JUnit tests still run in their own JVMs')
+    parser.add_argument('--jdart-batch-size', default=1, type=int, help='How many JDart driver programs to compile at once (0 for a whole round)')
+    parser.add_argument('--jdart-workers', default=1, type=int, help='How many JDart runs to execute concurrently')
+    parser.add_argument('--jdart-session-size', default=1, type=int, help='How many driver programs to run JDart on in one JPF session')
+    parser.add_argument('--adaptive-jdart-budget', default=False, action="store_true", help='Choose JDart and Z3 timeouts of a driver program from how productive earlier JDart runs were')
+    parser.add_argument('--jdart-budget-log', default='jdart-budgets.csv', help='A CSV file to log JDart budgets and outcomes of runs to with --adaptive-jdart-budget')
+    parser.add_argument('--jdart-stall-window', default=0, type=float, help='Stop a JDart run early when it writes no new concrete value for this many seconds (0 to never stop early). Runs in JPF sessions are never stopped early')
+    parser.add_argument('--randoop-shards', default=1, type=int, help='How many Randoop processes to run at once, each on a part of the class list')
+    parser.add_argument('--randoop-shard-by', default='package', choices=['package', 'size'], help='Split the class list between Randoop processes by package or by size of classes')
+    parser.add_argument('--class-index', default=None, help='List classes to test from class files of the system under test instead of from source files, leaving out classes that Randoop can\'t test, and keep an index of the class files in this file')
+    parser.add_argument('--harvest-literals', default=False, action="store_true", help='Give Randoop literals from constant pools and bytecode of class files of the classes under test, starting with the first round')
+    parser.add_argument('--literals-level', default='ALL', choices=['CLASS', 'PACKAGE', 'ALL'], help='Which classes Randoop uses concrete values found for a class under test for: the class, all classes in its package, or all classes')
     parser.add_argument('--jpf-core-path', help='Path to the jpf-core module')
     parser.add_argument('--jdart-path', help='Path to the jdart module')
     parser.add_argument('--sut-compilation', help='Directory where class files of the package being tested can be found')
@@ -827,12 +1664,52 @@ if __name__ == "__main__":
     jdoop.dependencies_classpath = params.classpath
     jdoop.randoop_time = params.randoop_time
     jdoop.jdart_time = params.jdart_time
+    if params.rebalance_budgets:
+        jdoop.phase_budget = PhaseBudget(params.randoop_time, params.jdart_time,
+                                         params.min_randoop_share, params.max_randoop_share)
     jdoop.benchmark_id = params.benchmark_id
     jdoop.prioritize_drivers = params.prioritize_drivers
+    jdoop.symbolization_workers = params.symbolization_workers
+    jdoop.prescan_top_k = params.prescan_top_k
+    jdoop.deduplicate_drivers = params.deduplicate_drivers
+    jdoop.literals_level = params.literals_level
+    jdoop.randoop_shards = max(params.randoop_shards, 1)
+    jdoop.randoop_shard_by = params.randoop_shard_by
+    if params.bandit_scheduler != None:
+        jdoop.driver_scheduler = BanditScheduler(
+            lambda driver: driver_family(driver, params.bandit_scheduler))
+    if params.symbolization_cache != None:
+        jdoop.symbolization_cache = SymbolizationCache(
+            params.symbolization_cache, params.symbolization_cache_size)
     jdoop.no_nhandler = params.no_nhandler
+    jdoop.jdart_workers = max(params.jdart_workers, 1)
+    jdoop.jdart_batch_size = max(params.jdart_batch_size, 0)
+    jdoop.jdart_session_size = max(params.jdart_session_size, 1)
+    jdoop.jdart_stall_window = max(params.jdart_stall_window, 0)
+    if params.adaptive_jdart_budget:
+        jdoop.jdart_budget = JDartBudget(params.jdart_budget_log)
+
+    # Start the JVM daemon. If it doesn't start, every command gets
+    # its own process as usual
+    jvm_daemon = None
+    if params.jvm_daemon != None:
+        jvm_daemon = JVMDaemon(scriptDir, os.path.join("build", "jvm-daemon"),
+                               stand_in = params.jvm_daemon == "stand-in")
+        if jvm_daemon.start():
+            use_jvm_daemon(jvm_daemon)
+        else:
+            jvm_daemon = None
+
+    # Build the JPF session launcher. Without it, every driver program
+    # gets a JPF run of its own
+    if jdoop.jdart_session_size > 1 and not jdoop.build_jpf_session(scriptDir):
+        print "Couldn't build the JPF session launcher, running one driver per JPF session"
+        jdoop.jdart_session_size = 1
 
     # Create a list of classes to be tested
     classlist = ClassList(params.classlist)
+    if params.class_index != None:
+        classlist.class_index = ClassIndex(jdoop.paths.sut_compilation_dir, params.class_index)
     classlist.write_list_of_classes(params.root)
 
     unit_tests = UnitTests(name = "Regression1Test", directory = "tests-round-1", randooped_package_name = "randooped1")
@@ -841,10 +1718,17 @@ if __name__ == "__main__":
     # Randoop
     timelimit = jdoop.determine_timelimit("Randoop")
 
+    # Harvest literals from class files so that the first run of
+    # Randoop has literals too
+    if params.harvest_literals:
+        jdoop.start_clock("Harvesting literals")
+        jdoop.harvest_literals(classlist, params.root, template_filename = os.path.join(scriptDir, "randoop-format.template"))
+        jdoop.stop_clock("Harvesting literals")
+
     # Invoke Randoop to generate unit tests
     init_seed = 10
     jdoop.start_clock("Randoop #1")
-    jdoop.run_randoop(unit_tests, classlist, timelimit, dont_terminate = True, seed = init_seed)
+    jdoop.run_randoop(unit_tests, classlist, timelimit, dont_terminate = True, use_concrete_values = bool(jdoop.harvested_literals), seed = init_seed)
     jdoop.stop_clock("Randoop #1")
 
     # Split up the main unit test suite class if needed. With 1 unit
@@ -853,6 +1737,10 @@ if __name__ == "__main__":
     #
     new_unit_tests = jdoop.check_and_split_up_suite(unit_tests, template_filename = os.path.join(scriptDir, "suite_header.template"))
 
+    if jdoop.phase_budget != None:
+        jdoop.phase_budget.record("Randoop", jdoop.total_clock_time("Randoop #1"),
+                                  sum([u.index_hi - u.index_lo for u in new_unit_tests]))
+
     # Start creating a list of unit tests
     unit_tests_list = new_unit_tests[:]
 
@@ -875,10 +1763,48 @@ if __name__ == "__main__":
         if os.path.exists(classlist.filename) != True:
             classlist.write_list_of_classes(params.root)
 
+        if params.pipeline:
+            # Start Randoop for the next round in the background with
+            # concrete values known so far. JDart runs alongside it
+            # and its values go to the round after the next one
+            randoop_timelimit = jdoop.determine_timelimit("Randoop")
+            randoop_thread = None
+            if randoop_timelimit > 3:
+                next_unit_tests = UnitTests(name = "Regression%dTest" % i, directory = "tests-round-%d" % i, randooped_package_name = "randooped%d" % i)
+                randoop_thread = threading.Thread(
+                    target = jdoop.run_randoop_round,
+                    args = (next_unit_tests, classlist, randoop_timelimit, init_seed + i, "Randoop #%d" % i))
+                randoop_thread.start()
+
         jdoop.start_clock("Global run of JDart #%d" % (i-1))
         jdoop.run_jdart_loop(unit_tests, params.root, classlist, timelimit, template_filename = os.path.join(scriptDir, "randoop-format.template"))
         jdoop.stop_clock("Global run of JDart #%d" % (i-1))
 
+        if jdoop.phase_budget != None:
+            jdoop.phase_budget.record("JDart", jdoop.total_clock_time("Global run of JDart #%d" % (i-1)),
+                                      jdoop.concrete_values_iterations_stats[-1][1])
+
+        if params.pipeline:
+            # JDart keeps to its own time limit, so a round lasts as
+            # long as the longer of the two phases
+            if randoop_thread != None:
+                randoop_thread.join()
+                unit_tests = next_unit_tests
+
+                new_unit_tests = jdoop.check_and_split_up_suite(unit_tests, template_filename = os.path.join(scriptDir, "suite_header.template"))
+                unit_tests_list.extend(new_unit_tests)
+
+                if jdoop.phase_budget != None:
+                    jdoop.phase_budget.record("Randoop", jdoop.total_clock_time("Randoop #%d" % i),
+                                              sum([u.index_hi - u.index_lo for u in new_unit_tests]))
+                    jdoop.rebalance_budgets("round %d" % i)
+
+            # Check if we're out of time and break out of the loop if so
+            if time.time() >= have_to_finish_by - 3 or jdoop.baseline:
+                break
+
+            continue
+
         # Run Randoop
         timelimit = jdoop.determine_timelimit("Randoop")
         if timelimit > 3:
@@ -904,6 +1830,11 @@ if __name__ == "__main__":
 
             unit_tests_list.extend(new_unit_tests)
 
+            if jdoop.phase_budget != None:
+                jdoop.phase_budget.record("Randoop", jdoop.total_clock_time("Randoop #%d" % i),
+                                          sum([u.index_hi - u.index_lo for u in new_unit_tests]))
+                jdoop.rebalance_budgets("round %d" % i)
+
         # Check if we're out of time and break out of the loop if so
         if time.time() >= have_to_finish_by - 3:
             break
@@ -920,6 +1851,9 @@ if __name__ == "__main__":
 
     jdoop.stop_clock("program")
 
+    if jdoop.symbolization_cache != None:
+        jdoop.symbolization_cache.save()
+
     if params.generate_report:
         print "Started compiling test cases... "
         jdoop.start_clock("Compilation of unit tests")
@@ -939,24 +1873,35 @@ if __name__ == "__main__":
         # Run all tests and let JaCoCo measure coverage
         jdoop.start_clock("Code coverage report")
 
-        for unit_tests_suite in unit_tests_list[:-1]:
-            if params.jdart_coverage_only and (unit_tests_suite.name[:10] == "Regression"):
-                continue
+        if params.single_jvm_coverage or params.coverage_shards > 1:
+            suite_names = [unit_tests_suite.name for unit_tests_suite in unit_tests_list
+                           if not (params.jdart_coverage_only and unit_tests_suite.name[:10] == "Regression")]
+            if suite_names != []:
+                report = Report(jdoop.paths.lib_jacoco, suite_names, classpath, params.root, jdoop.paths.sut_compilation_dir, params.coverage_shards)
+                report.run_code_coverage_in_shards(jdoop.paths.tests_compilation_dir)
+        else:
+            for unit_tests_suite in unit_tests_list[:-1]:
+                if params.jdart_coverage_only and (unit_tests_suite.name[:10] == "Regression"):
+                    continue
 
-            report = Report(jdoop.paths.lib_jacoco, [unit_tests_suite.name], classpath, params.root, jdoop.paths.sut_compilation_dir)
-            report.run_testing()
+                report = Report(jdoop.paths.lib_jacoco, [unit_tests_suite.name], classpath, params.root, jdoop.paths.sut_compilation_dir)
+                report.run_testing()
 
-        # Run code coverage for the last one and generate a report
-        if params.jdart_coverage_only:
-            if not (unit_tests_list[-1].name[:10] == "Regression"):
+            # Run code coverage for the last one and generate a report
+            if params.jdart_coverage_only:
+                if not (unit_tests_list[-1].name[:10] == "Regression"):
+                    report = Report(jdoop.paths.lib_jacoco, [unit_tests_list[-1].name], classpath, params.root, jdoop.paths.sut_compilation_dir)
+                    report.run_code_coverage()
+            else:
                 report = Report(jdoop.paths.lib_jacoco, [unit_tests_list[-1].name], classpath, params.root, jdoop.paths.sut_compilation_dir)
                 report.run_code_coverage()
-        else:
-            report = Report(jdoop.paths.lib_jacoco, [unit_tests_list[-1].name], classpath, params.root, jdoop.paths.sut_compilation_dir)
-            report.run_code_coverage()
 
         jdoop.stop_clock("Code coverage report")
 
+    if jvm_daemon != None:
+        use_jvm_daemon(None)
+        jvm_daemon.stop()
+
     # Print execution time statistics
     jdoop.print_stats()
 
@@ -973,3 +1918,7 @@ if __name__ == "__main__":
         print "\nContribution of each iteration"
         for s in jdoop.concrete_values_iterations_stats:
             print "Set size: %4d, contribution: %4d, unit tests name: %s" % (s[0], s[1], s[2])
+
+        print "\nLiterals given to Randoop after each iteration"
+        for s in jdoop.literals_store.export_stats:
+            print "Literals: %4d, evicted: %4d, unit tests name: %s" % (s[0], s[1], s[2])
@@ -0,0 +1,102 @@
+/*
+ * Copyright 2017 Marko Dimjašević
+ *
+ * This file is part of JDoop.
+ *
+ * JDoop is free software: you can redistribute it and/or modify
+ * it under the terms of the GNU General Public License as published by
+ * the Free Software Foundation, either version 3 of the License, or
+ * (at your option) any later version.
+ *
+ * JDoop is distributed in the hope that it will be useful,
+ * but WITHOUT ANY WARRANTY; without even the implied warranty of
+ * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ * GNU General Public License for more details.
+ *
+ * You should have received a copy of the GNU General Public License
+ * along with JDoop.  If not, see <http://www.gnu.org/licenses/>.
+*/
+
+import gov.nasa.jpf.Config;
+
+import java.io.FileInputStream;
+import java.io.FileWriter;
+import java.io.IOException;
+import java.io.InputStream;
+import java.io.PrintWriter;
+import java.lang.reflect.InvocationTargetException;
+import java.lang.reflect.Method;
+import java.util.Properties;
+
+/**
+ * Runs JDart on several driver programs one after another in a single
+ * JPF session:
+ *
+ *   java -cp RunJPF.jar:<this class> JDoopJPFSession [-times <file>] <session.jpf> <driver.jpf>...
+ *
+ * The session configuration has the settings that all driver programs
+ * share (class path, nhandler, the shell, the constraint solver). A
+ * driver configuration has the target, the concolic method, the
+ * values file and the time budget of one driver program, and it is
+ * applied on top of the session configuration before JDart runs on
+ * that driver program. JPF's class loader, the solver and native
+ * libraries are set up once for all of them instead of once per
+ * driver program as with bin/jpf.
+ *
+ * With -times, a line with the driver configuration and the seconds
+ * JDart took on it is appended to the file as soon as each driver
+ * program is done, so the times of finished driver programs survive
+ * a session that is killed.
+ */
+public class JDoopJPFSession {
+
+  public static void main(String[] args) throws Exception {
+    PrintWriter times = null;
+    int first = 0;
+    if (args.length >= 2 && args[0].equals("-times")) {
+      times = new PrintWriter(new FileWriter(args[1], true));
+      first = 2;
+    }
+    if (args.length < first + 1) {
+      System.err.println("usage: JDoopJPFSession [-times <file>] <session.jpf> <driver.jpf>...");
+      System.exit(2);
+    }
+
+    Config conf = new Config(new String[] { args[first] });
+    ClassLoader loader = conf.initClassLoader(JDoopJPFSession.class.getClassLoader());
+    Method start = loader.loadClass("gov.nasa.jpf.JPF")
+      .getMethod("start", Config.class, String[].class);
+
+    int failed = 0;
+    for (int i = first + 1; i < args.length; i++) {
+      Properties driver = new Properties();
+      try (InputStream in = new FileInputStream(args[i])) {
+        driver.load(in);
+      } catch (IOException e) {
+        System.err.println("Can't read " + args[i] + ": " + e);
+        failed++;
+        continue;
+      }
+      for (String key : driver.stringPropertyNames()) {
+        conf.setProperty(key, driver.getProperty(key));
+      }
+
+      System.err.println("Starting JDart on " + args[i]);
+      long startTime = System.nanoTime();
+      try {
+        start.invoke(null, conf, new String[0]);
+      } catch (InvocationTargetException e) {
+        // A driver program that breaks JPF shouldn't take the rest
+        // of the session down with it
+        e.getCause().printStackTrace();
+        failed++;
+      }
+      if (times != null) {
+        times.println(args[i] + "\t" + (System.nanoTime() - startTime) / 1e9);
+        times.flush();
+      }
+    }
+
+    System.exit(failed == 0 ? 0 : 1);
+  }
+}
@@ -0,0 +1,210 @@
+/*
+ * Copyright 2017 Marko Dimjašević
+ *
+ * This file is part of JDoop.
+ *
+ * JDoop is free software: you can redistribute it and/or modify
+ * it under the terms of the GNU General Public License as published by
+ * the Free Software Foundation, either version 3 of the License, or
+ * (at your option) any later version.
+ *
+ * JDoop is distributed in the hope that it will be useful,
+ * but WITHOUT ANY WARRANTY; without even the implied warranty of
+ * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ * GNU General Public License for more details.
+ *
+ * You should have received a copy of the GNU General Public License
+ * along with JDoop.  If not, see <http://www.gnu.org/licenses/>.
+*/
+
+import java.io.*;
+import java.lang.reflect.InvocationTargetException;
+import java.lang.reflect.Method;
+import java.net.*;
+import java.security.Permission;
+import java.util.ArrayList;
+import java.util.Arrays;
+import java.util.List;
+import javax.tools.JavaCompiler;
+import javax.tools.ToolProvider;
+
+/**
+ * A long-lived JVM that runs compilation jobs and main methods for
+ * JDoop so that they don't pay for JVM startup each time.
+ *
+ * Every job comes over its own connection to a loopback socket as
+ * one line of tab-separated fields:
+ *
+ *   RUN <id> javac - - <javac arguments...>
+ *   RUN <id> java <classpath> <main class> <arguments...>
+ *   SHUTDOWN
+ *
+ * A RUN job is answered with a line "EXIT <status>" followed by
+ * whatever the job wrote to its error stream if it is a javac job.
+ * Each java job gets its own class loader, and System.exit() calls
+ * from jobs are trapped and turned into the job's exit status. A job
+ * that can't run in this JVM because its classes don't link or load,
+ * e.g. because a native library is already loaded by another job's
+ * class loader, is answered with a line "FAIL <reason>" instead, and
+ * the client should run it as a process of its own.
+ *
+ * Jobs can't be killed: stopping a thread can leave monitors held and
+ * static fields half-written for every later job, so anything that
+ * needs a timeout runs as a process of its own instead.
+ */
+public class JDoopDaemon {
+
+  private static final ThreadLocal<Boolean> inJob =
+    new InheritableThreadLocal<Boolean>() {
+      @Override
+      protected Boolean initialValue() {
+        return false;
+      }
+    };
+
+  private static class ExitTrappedException extends SecurityException {
+    final int status;
+
+    ExitTrappedException(int status) {
+      this.status = status;
+    }
+  }
+
+  public static void main(String[] args) throws IOException {
+    System.setSecurityManager(new SecurityManager() {
+        @Override
+        public void checkPermission(Permission perm) { }
+
+        @Override
+        public void checkPermission(Permission perm, Object context) { }
+
+        @Override
+        public void checkExit(int status) {
+          if (inJob.get()) {
+            throw new ExitTrappedException(status);
+          }
+        }
+      });
+
+    ServerSocket server = new ServerSocket(0, 50, InetAddress.getLoopbackAddress());
+    System.out.println("port " + server.getLocalPort());
+    System.out.flush();
+
+    while (true) {
+      final Socket socket = server.accept();
+      new Thread(new Runnable() {
+          public void run() {
+            handle(socket);
+          }
+        }).start();
+    }
+  }
+
+  private static void handle(Socket socket) {
+    try {
+      BufferedReader in = new BufferedReader(
+        new InputStreamReader(socket.getInputStream(), "UTF-8"));
+      String line = in.readLine();
+      if (line == null) {
+        return;
+      }
+      String[] fields = line.split("\t", -1);
+
+      if (fields[0].equals("SHUTDOWN")) {
+        System.exit(0);
+      } else if (fields[0].equals("RUN")) {
+        ByteArrayOutputStream err = new ByteArrayOutputStream();
+        String[] failure = {null};
+        int status = run(fields[1], fields[2], fields[3], fields[4],
+                         Arrays.copyOfRange(fields, 5, fields.length), err,
+                         failure);
+        OutputStream out = socket.getOutputStream();
+        if (failure[0] != null) {
+          out.write(("FAIL " + failure[0].replace('\n', ' ') + "\n")
+                    .getBytes("UTF-8"));
+        } else {
+          out.write(("EXIT " + status + "\n").getBytes("UTF-8"));
+          err.writeTo(out);
+        }
+        out.flush();
+      }
+    } catch (IOException e) {
+      e.printStackTrace();
+    } finally {
+      try {
+        socket.close();
+      } catch (IOException e) { }
+    }
+  }
+
+  private static int run(final String id, final String kind,
+                         final String classpath, final String mainClass,
+                         final String[] args, final OutputStream err,
+                         final String[] failure) {
+    final int[] status = {0};
+    Thread thread = new Thread(new Runnable() {
+        public void run() {
+          inJob.set(true);
+          try {
+            if (kind.equals("javac")) {
+              status[0] = compile(args, err);
+            } else {
+              runMain(classpath, mainClass, args);
+            }
+          } catch (ExitTrappedException e) {
+            status[0] = e.status;
+          } catch (LinkageError e) {
+            failure[0] = e.toString();
+          } catch (ClassNotFoundException e) {
+            failure[0] = e.toString();
+          } catch (Throwable e) {
+            e.printStackTrace();
+            status[0] = 1;
+          }
+        }
+      });
+
+    thread.setName("job-" + id);
+    thread.start();
+    try {
+      thread.join();
+    } catch (InterruptedException e) {
+      status[0] = 1;
+    }
+
+    return status[0];
+  }
+
+  private static int compile(String[] args, OutputStream err) {
+    JavaCompiler compiler = ToolProvider.getSystemJavaCompiler();
+    return compiler.run(null, null, err, args);
+  }
+
+  private static void runMain(String classpath, String mainClass, String[] args)
+    throws Throwable {
+
+    List<URL> urls = new ArrayList<URL>();
+    for (String entry : classpath.split(File.pathSeparator)) {
+      if (!entry.isEmpty()) {
+        urls.add(new File(entry).toURI().toURL());
+      }
+    }
+
+    // The parent is the extension class loader so that nothing from
+    // the daemon's own class path leaks into the job
+    URLClassLoader loader = new URLClassLoader(
+      urls.toArray(new URL[urls.size()]),
+      ClassLoader.getSystemClassLoader().getParent());
+    Thread.currentThread().setContextClassLoader(loader);
+
+    try {
+      Class<?> cls = Class.forName(mainClass, true, loader);
+      Method main = cls.getMethod("main", String[].class);
+      main.invoke(null, (Object) args);
+    } catch (InvocationTargetException e) {
+      throw e.getCause();
+    } finally {
+      loader.close();
+    }
+  }
+}
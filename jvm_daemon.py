@@ -0,0 +1,220 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright 2017 Marko Dimjašević
+#
+# This file is part of JDoop.
+#
+# JDoop is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# JDoop is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with JDoop.  If not, see <http://www.gnu.org/licenses/>.
+
+# A client for a long-lived JVM that compiles and runs Java programs
+# for JDoop (jvm-daemon/JDoopDaemon.java), and a stand-in server that
+# speaks the same protocol but starts a new process for every job.
+
+
+import os, sys, signal
+import socket
+import subprocess, threading
+import itertools
+
+class DaemonError(Exception):
+    pass
+
+
+class Job:
+    _ids = itertools.count()
+    _ids_lock = threading.Lock()
+
+    def __init__(self, kind, args, classpath = "-", main_class = "-"):
+        with Job._ids_lock:
+            self.id = str(Job._ids.next())
+        self.kind = kind
+        self.args = args
+        self.classpath = classpath
+        self.main_class = main_class
+
+    def request(self):
+        return "\t".join(["RUN", self.id, self.kind, self.classpath,
+                          self.main_class] + self.args) + "\n"
+
+
+def javac_job(args):
+    """A job that runs javac with given command line arguments"""
+
+    return Job("javac", args)
+
+def java_job(classpath, main_class, args):
+    """A job that runs the main method of a class in a class loader of
+    its own. The class runs in the daemon's JVM, so a job can't have
+    JVM options of its own such as a -javaagent, and it can't load a
+    native library that an earlier job loaded, as JPF with Z3 does"""
+
+    return Job("java", args, classpath, main_class)
+
+
+class JVMDaemon:
+    def __init__(self, script_dir, build_dir, stand_in = False):
+        self.script_dir = script_dir
+        self.build_dir = build_dir
+        self.stand_in = stand_in
+        self.process = None
+        self.port = None
+
+    def start(self):
+        """Starts the daemon and returns whether it is ready to accept
+        jobs"""
+
+        if self.stand_in:
+            args = [sys.executable, os.path.realpath(__file__), "--stand-in"]
+        else:
+            source = os.path.join(self.script_dir, "jvm-daemon", "JDoopDaemon.java")
+            try:
+                os.makedirs(self.build_dir)
+            except:
+                pass
+            if subprocess.call(["javac", "-d", self.build_dir, source]) != 0:
+                sys.stderr.write("Couldn't compile the JVM daemon\n")
+                return False
+            args = (["java"] + os.environ.get("JVM_FLAGS", "").split() +
+                    ["-cp", self.build_dir, "JDoopDaemon"])
+
+        try:
+            self.process = subprocess.Popen(args, stdout=subprocess.PIPE)
+        except OSError, err:
+            sys.stderr.write("Couldn't start the JVM daemon: %s\n" % err)
+            return False
+
+        line = self.process.stdout.readline()
+        if not line.startswith("port "):
+            sys.stderr.write("The JVM daemon didn't report its port\n")
+            self.process.kill()
+            return False
+        self.port = int(line.split()[1])
+
+        # Jobs write to the daemon's standard output, so keep passing
+        # it on to ours
+        def forward():
+            for line in iter(self.process.stdout.readline, ""):
+                sys.stdout.write(line)
+        forwarder = threading.Thread(target=forward)
+        forwarder.daemon = True
+        forwarder.start()
+
+        return True
+
+    def send(self, message):
+        try:
+            connection = socket.create_connection(("127.0.0.1", self.port))
+            connection.sendall(message)
+            return connection
+        except socket.error, err:
+            raise DaemonError(str(err))
+
+    def run_job(self, job):
+        """Runs a job in the daemon and waits for it to finish. Returns
+        the job's exit status and its captured error output. Raises
+        DaemonError if the job can't run in the daemon's JVM"""
+
+        connection = self.send(job.request())
+        chunks = []
+        try:
+            while True:
+                chunk = connection.recv(4096)
+                if chunk == "":
+                    break
+                chunks.append(chunk)
+        except socket.error, err:
+            raise DaemonError(str(err))
+        finally:
+            connection.close()
+
+        response = "".join(chunks)
+        (status_line, _, stderr) = response.partition("\n")
+        if status_line.startswith("FAIL "):
+            raise DaemonError("Job %s can't run in the daemon: %s" % (job.id, status_line[5:]))
+        if not status_line.startswith("EXIT "):
+            raise DaemonError("Unexpected response to job %s: %s" % (job.id, status_line))
+
+        return (int(status_line.split()[1]), stderr)
+
+    def stop(self):
+        if self.process == None:
+            return
+        try:
+            self.send("SHUTDOWN\n").close()
+        except DaemonError:
+            pass
+        self.process.wait()
+        self.process = None
+
+
+def run_stand_in_server():
+    """Serves jobs with one new process per job. It is good enough to
+    test JDoop's side of the daemon without a JVM at hand"""
+
+    import SocketServer
+
+    processes = {}
+
+    class JobHandler(SocketServer.StreamRequestHandler):
+        def handle(self):
+            fields = self.rfile.readline()[:-1].split("\t")
+
+            if fields[0] == "SHUTDOWN":
+                threading.Thread(target=server.shutdown).start()
+            elif fields[0] == "RUN":
+                [job_id, kind, classpath, main_class] = fields[1:5]
+                if kind == "javac":
+                    args = ["javac"] + fields[5:]
+                else:
+                    args = ["java", "-cp", classpath, main_class] + fields[5:]
+
+                try:
+                    process = subprocess.Popen(
+                        args, stderr=subprocess.PIPE, preexec_fn=os.setsid)
+                except OSError, err:
+                    self.wfile.write("EXIT 127\n%s\n" % err)
+                    return
+                processes[job_id] = process
+                (_, stderr) = process.communicate()
+                del processes[job_id]
+
+                status = process.returncode
+                if status < 0:
+                    status = 128 - status
+                self.wfile.write("EXIT %i\n" % status)
+                if kind == "javac":
+                    self.wfile.write(stderr)
+                else:
+                    sys.stderr.write(stderr)
+
+    server = SocketServer.ThreadingTCPServer(("127.0.0.1", 0), JobHandler)
+    print "port %i" % server.server_address[1]
+    sys.stdout.flush()
+    server.serve_forever()
+
+    # Don't leave jobs behind once the server is shut down
+    for process in processes.values():
+        os.killpg(process.pid, signal.SIGTERM)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Runs a stand-in for the JDoop JVM daemon.')
+    parser.add_argument('--stand-in', default=False, action="store_true", help='Serve jobs with a new process per job')
+    params = parser.parse_args()
+
+    if params.stand_in:
+        run_stand_in_server()
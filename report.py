@@ -21,9 +21,14 @@
 
 import os
 from command import *
+from jvm_daemon import javac_job
+
+# Only compilation of suites goes to the JVM daemon, if there is one.
+# Unit tests run under JaCoCo's agent, which has to be given to a JVM
+# when it starts, so they always get a JVM of their own through ant
 
 class Report:
-    def __init__(self, jacoco_path, unit_tests_list, classpath, source_dir, build_dir):
+    def __init__(self, jacoco_path, unit_tests_list, classpath, source_dir, build_dir, shards = 1):
         self.jacoco_path = jacoco_path
         self.unit_tests_list = unit_tests_list
         self.classpath = classpath
@@ -31,6 +36,7 @@ class Report:
         self.build_dir = build_dir
         self.script_dir = os.path.dirname(os.path.realpath(__file__))
         self.jacoco_site = os.path.join(os.getcwd(), "jacoco-site")
+        self.shards = shards
     
     def run_testing(self, ut_list = None):
 
@@ -42,6 +48,68 @@ class Report:
             code_coverage_command = Command(args = "ant -f %s -Darg0=%s -Darg1=%s -Darg2=%s -Darg3=%s -Darg4=%s -Darg5=%s test" % (os.path.join(self.script_dir, "jacoco.xml"), self.jacoco_path, uts, self.classpath, self.source_dir, self.build_dir, self.jacoco_site))
             code_coverage_command.run()
 
+    def write_all_tests_suite(self, suite_dir, suite_name, ut_list = None):
+        """Writes a JUnit suite that runs all unit tests from the list and
+        compiles it to suite_dir"""
+
+        if ut_list == None:
+            ut_list = self.unit_tests_list
+
+        from string import Template
+
+        with open(os.path.join(self.script_dir, "suite_header.template"), 'r') as f:
+            suite_template = Template(f.read())
+
+        suite_path = os.path.join(suite_dir, suite_name + ".java")
+        with open(suite_path, 'w') as f:
+            f.write(suite_template.substitute(
+                classes = ",\n".join(["%s.class" % uts for uts in ut_list]),
+                classname = suite_name))
+
+        compile_command = Command(args = "javac -g -d %s -classpath %s %s" % (suite_dir, self.classpath, suite_path),
+                                  job = javac_job(["-g", "-d", suite_dir, "-classpath", self.classpath, suite_path]))
+        compile_command.run()
+
+    def run_code_coverage_in_one_jvm(self, suite_dir, suite_name = "JDoopAllTests"):
+        """Runs JaCoCo on all unit tests from the list in a single JVM and
+        generates a code coverage report"""
+
+        self.write_all_tests_suite(suite_dir, suite_name)
+
+        report_command = Command(args = "ant -f %s -Darg0=%s -Darg1=%s -Darg2=%s -Darg3=%s -Darg4=%s -Darg5=%s report" % (os.path.join(self.script_dir, "jacoco.xml"), self.jacoco_path, suite_name, ":".join([suite_dir, self.classpath]), self.source_dir, self.build_dir, self.jacoco_site))
+        report_command.run()
+
+    def run_code_coverage_in_shards(self, suite_dir):
+        """Runs JaCoCo on all unit tests from the list split up into
+        self.shards suites that run in parallel JVMs, merges their
+        execution data and generates a code coverage report"""
+
+        shards = min(self.shards, len(self.unit_tests_list))
+        if shards <= 1:
+            self.run_code_coverage_in_one_jvm(suite_dir)
+            return
+
+        # Execution data from a previous run would get merged in too
+        if os.path.isdir(self.jacoco_site):
+            for name in os.listdir(self.jacoco_site):
+                if name.startswith("jacoco-shard-"):
+                    os.remove(os.path.join(self.jacoco_site, name))
+
+        commands = []
+        for shard in range(shards):
+            suite_name = "JDoopShard%iTests" % shard
+            self.write_all_tests_suite(suite_dir, suite_name, self.unit_tests_list[shard::shards])
+
+            command = CommandWithTimeout(args = "ant -f %s -Darg0=%s -Darg1=%s -Darg2=%s -Darg3=%s -Darg4=%s -Darg5=%s -Dexecfile=%s test" % (os.path.join(self.script_dir, "jacoco.xml"), self.jacoco_path, suite_name, ":".join([suite_dir, self.classpath]), self.source_dir, self.build_dir, self.jacoco_site, os.path.join(self.jacoco_site, "jacoco-shard-%i.exec" % shard)))
+            command.run_without_joining()
+            commands.append(command)
+
+        for command in commands:
+            command.join_thread()
+
+        report_command = Command(args = "ant -f %s -Darg0=%s -Darg1=%s -Darg2=%s -Darg3=%s -Darg4=%s -Darg5=%s merged-report" % (os.path.join(self.script_dir, "jacoco.xml"), self.jacoco_path, "-", self.classpath, self.source_dir, self.build_dir, self.jacoco_site))
+        report_command.run()
+
     def run_code_coverage(self):
         """Runs JaCoCo on all unit tests from the list and generates a code coverage report"""
 
@@ -62,8 +130,13 @@ if __name__ == "__main__":
     parser.add_argument('--classpath', default=".", help='Classpath is a Java classpath, where paths are separated by the : symbol')
     parser.add_argument('--sourcepath', nargs='+', help='Root directory where project source files can be found')
     parser.add_argument('--buildpath', required=True, help='Root directory where project class files can be found')
+    parser.add_argument('--suite-dir', default=None, help='Run unit tests through suites compiled to this directory instead of one JVM per unit test class')
+    parser.add_argument('--shards', default=1, type=int, help='Number of JVMs to run the suites in parallel (with --suite-dir)')
     params = parser.parse_args()
 
     for src in params.sourcepath:
-        report = Report(params.jacocopath, params.unittests, ":".join([params.classpath, "lib/junit4.jar"]), src, params.buildpath)
-        report.run_code_coverage()
+        report = Report(params.jacocopath, params.unittests, ":".join([params.classpath, "lib/junit4.jar"]), src, params.buildpath, params.shards)
+        if params.suite_dir != None:
+            report.run_code_coverage_in_shards(params.suite_dir)
+        else:
+            report.run_code_coverage()
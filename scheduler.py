@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright 2017 Marko Dimjašević
+#
+# This file is part of JDoop.
+#
+# JDoop is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# JDoop is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with JDoop.  If not, see <http://www.gnu.org/licenses/>.
+
+# Orders driver programs for JDart by how many new concrete values
+# their families have been yielding
+
+
+import math
+import threading
+from collections import OrderedDict, deque
+
+class BanditScheduler:
+    """Picks driver programs to run JDart on as a multi-armed bandit.
+    The arms are families of driver programs (e.g. drivers that call
+    the same method), and the reward of a JDart run is the number of
+    new concrete values it found per second. A family is picked by an
+    upper confidence bound (UCB1) on its reward, with families that
+    weren't tried yet assumed to be as good as the average. What is
+    learned about families carries over to later rounds"""
+
+    # How many seconds of average reward a family starts with
+    PRIOR_SECONDS = 10.0
+
+    # Weight of the exploration term of the bound
+    EXPLORATION = 1.0
+
+    def __init__(self, family_of):
+        self.family_of = family_of
+        # Per family and over all families: number of runs, seconds,
+        # and new values
+        self.stats = {}
+        self.totals = (0, 0.0, 0)
+        self.lock = threading.Lock()
+
+    def schedule(self, drivers):
+        """Yields driver programs one at a time. Within a family, the
+        order of the given drivers is kept, and families that are
+        equally promising are taken in the order their first driver
+        program comes in"""
+
+        families = OrderedDict()
+        for driver in drivers:
+            families.setdefault(self.family_of(driver), deque()).append(driver)
+
+        while families:
+            family = self.choose(families.keys())
+            driver = families[family].popleft()
+            if not families[family]:
+                del families[family]
+            yield driver
+
+    def choose(self, families):
+        with self.lock:
+            (total_runs, total_seconds, total_new_values) = self.totals
+
+            # Rewards are relative to the average one. Until anything
+            # is found, all families look the same
+            average = (total_new_values + 1.0) / (total_seconds + self.PRIOR_SECONDS)
+
+            best = None
+            for family in families:
+                (runs, seconds, new_values) = self.stats.get(family, (0, 0.0, 0))
+                mean = (new_values + average * self.PRIOR_SECONDS) / (seconds + self.PRIOR_SECONDS)
+                bound = mean + self.EXPLORATION * average * math.sqrt(
+                    math.log(total_runs + 1) / (runs + 1))
+                if best == None or bound > best_bound:
+                    (best, best_bound) = (family, bound)
+
+        return best
+
+    def record(self, driver, seconds, new_values):
+        """Records the outcome of a JDart run on a driver program"""
+
+        family = self.family_of(driver)
+        with self.lock:
+            (runs, total_seconds, total_new_values) = self.stats.get(family, (0, 0.0, 0))
+            self.stats[family] = (runs + 1, total_seconds + seconds,
+                                  total_new_values + new_values)
+            (runs, total_seconds, total_new_values) = self.totals
+            self.totals = (runs + 1, total_seconds + seconds,
+                           total_new_values + new_values)
+
+    def top_families(self, n = 10):
+        """Returns up to n (family, runs, seconds, new values) tuples of
+        families with the most new values per second"""
+
+        with self.lock:
+            families = [(family,) + stats for (family, stats) in self.stats.items()]
+
+        families.sort(key=lambda (family, runs, seconds, new_values):
+                      -new_values / max(seconds, 1e-9))
+        return families[:n]
@@ -21,77 +21,241 @@
 
 import re
 import sys, os, errno, fileinput
+import sets
 import argparse
 
-class Callable:
-    def __init__(self, anycallable):
-        self.__call__ = anycallable
+# A line of Java code is lexed into string literals (terminated or
+# not), parentheses and commas, and runs of everything else. This is
+# all that is needed to find parameters of a call in the line
+token_prog = re.compile(r'("(?:[^"\\]|\\.)*")|("(?:[^"\\]|\\.)*\\?)|([(),])|([^"(),]+)', re.DOTALL)
 
-class Literal:
-    def represents_int(s):
-        if s == "":
-            return False
-        try:
-            if s[0] == "(":
-                int(s[1:-1])
-            else:
-                int(s)
-            return True
-        except ValueError:
-            return False
+STRING = 1
+UNTERMINATED_STRING = 2
+PUNCTUATION = 3
+TEXT = 4
 
-    def represents_long(s):
-        if s == "":
-            return False
+def tokenize(line):
+    """Splits a line into a list of (position, token, kind) triples"""
 
-        expr = s
+    return [(m.start(), m.group(), m.lastindex) for m in token_prog.finditer(line)]
 
-        if s[0] == "(" and s[-1] == ")":
-            expr = s[1:-1]
-        if expr[-1] == "l" or expr[-1] == "L":
-            expr = expr[:-1]
+# Patterns that can't be expressed as a simple substring check
+static_call_prog = re.compile("^.*\..*\(.*\) *;$")
+assert_fail_prog = re.compile("org.junit.Assert.fail")
 
-        try:
-            long(expr)
-            return True
-        except ValueError:
-            return False
+def is_skipped_line(line):
+    """Checks if a line of a unit test has no bearing on its driver
+    program. The line is without its newline character"""
 
-    def represents_float(s):
-        if s == "":
-            return False
+    if "public class" in line:
+        return True
 
-        expr = s
+    if "@Test" in line:
+        return True
 
-        if s[0] == "(" and s[-1] == ")":
-            expr = s[1:-1]
-        if expr[-1] == "f" or expr[-1] == "F":
-            expr = expr[:-1]
+    # If this is a line that imports JUnit classes, a line that
+    # defines a debugging variable, or the final line that only has a
+    # closing bracket of the class, skip it
+    return ("import " in line or "public static boolean debug = false;" in line or line[0:1] == '}' or "if (debug)" in line or "NAME_ASCENDING" in line)
 
+class Callable:
+    def __init__(self, anycallable):
+        self.__call__ = anycallable
+
+# What it means for a string to be a literal of each type. These
+# checks are slow as they parse the string and handle an exception
+# for most strings, so JDoop goes through literal_types() instead
+
+def parses_as_int(s):
+    if s == "":
+        return False
+    try:
+        if s[0] == "(":
+            int(s[1:-1])
+        else:
+            int(s)
+        return True
+    except ValueError:
+        return False
+
+def parses_as_long(s):
+    if s == "":
+        return False
+
+    expr = s
+
+    if s[0] == "(" and s[-1] == ")":
+        expr = s[1:-1]
+    if expr[-1] == "l" or expr[-1] == "L":
+        expr = expr[:-1]
+
+    try:
+        long(expr)
+        return True
+    except ValueError:
+        return False
+
+def parses_as_float(s):
+    if s == "":
+        return False
+
+    expr = s
+
+    if s[0] == "(" and s[-1] == ")":
+        expr = s[1:-1]
+    if expr[-1] == "f" or expr[-1] == "F":
+        expr = expr[:-1]
+
+    try:
+        float(expr)
+        return True
+    except ValueError:
+        return False
+
+def parses_as_double(s):
+    if s == "":
+        return False
+
+    expr = s
+
+    if s[0] == "(" and s[-1] == ")":
+        expr = s[1:-1]
+    if re.search("^Double\.", s):
+        return True
+    if expr[-1] == "d" or expr[-1] == "D":
+        expr = expr[:-1]
+
+    try:
+        float(expr)
+        return True
+    except ValueError:
+        return False
+
+def parses_as_boolean(s):
+    return s == "true" or s == "false"
+
+def parses_as_string(s):
+    if s == "":
+        return False
+
+    return s[0] == '"' and s[-1] == '"'
+
+def parses_as_primitive(s):
+    return (parses_as_int(s) or parses_as_long(s) or
+            parses_as_float(s) or parses_as_double(s) or
+            parses_as_boolean(s))
+
+# Types of literals a string represents, combined as bit flags
+INT_LITERAL = 1
+LONG_LITERAL = 2
+FLOAT_LITERAL = 4
+DOUBLE_LITERAL = 8
+BOOLEAN_LITERAL = 16
+STRING_LITERAL = 32
+# Set when one of the checks above raises an exception for a string
+# (they do so for "()"). Such a string is left to the checks
+# themselves so that they raise the same exception
+MALFORMED_LITERAL = 64
+
+# A decimal number, optionally in parentheses, as Randoop writes
+# int, long, float and double literals
+numeric_literal_prog = re.compile(r'(\()?[-+]?[0-9]+(\.[0-9]*)?([eE][-+]?[0-9]+)?([lLfFdD])?(\))?\Z')
+# A Java identifier, which is not a literal unless Python's float()
+# takes it for infinity or NaN
+name_prog = re.compile(r'[A-Za-z_$][A-Za-z0-9_$]*\Z')
+float_names = sets.Set(["inf", "infinity", "nan"])
+
+reference_checks = [(INT_LITERAL, parses_as_int),
+                    (LONG_LITERAL, parses_as_long),
+                    (FLOAT_LITERAL, parses_as_float),
+                    (DOUBLE_LITERAL, parses_as_double),
+                    (BOOLEAN_LITERAL, parses_as_boolean),
+                    (STRING_LITERAL, parses_as_string)]
+
+def classify_literal(s):
+    """Returns the types of literals a string represents. It agrees
+    with the parses_as_* checks, but decides the strings found in
+    Randoop's unit tests without running them"""
+
+    if s == "":
+        return 0
+
+    m = numeric_literal_prog.match(s)
+    if m != None and (m.group(1) == None) == (m.group(5) == None):
+        whole = m.group(2) == None and m.group(3) == None
+        suffix = m.group(4)
+        types = 0
+        if whole and suffix == None:
+            types |= INT_LITERAL
+        if whole and (suffix == None or suffix in "lL"):
+            types |= LONG_LITERAL
+        if suffix == None or suffix in "fF":
+            types |= FLOAT_LITERAL
+        if suffix == None or suffix in "dD":
+            types |= DOUBLE_LITERAL
+        return types
+
+    if s == "true" or s == "false":
+        return BOOLEAN_LITERAL
+
+    if s[0] == '"' and s[-1] == '"':
+        return STRING_LITERAL
+
+    if (name_prog.match(s) and not s.lower() in float_names
+        and not s[:-1].lower() in float_names):
+        return 0
+
+    types = 0
+    for (flag, parses) in reference_checks:
         try:
-            float(expr)
-            return True
-        except ValueError:
-            return False
+            if parses(s):
+                types |= flag
+        except IndexError:
+            types |= MALFORMED_LITERAL
+    return types
+
+# Unit tests repeat the same few literals over and over, so the types
+# of recently seen strings are remembered. The memo is emptied once it
+# is full
+literal_memo = {}
+literal_memo_size = 65536
+
+def literal_types(s):
+    """Returns the types of literals a string represents, as a
+    combination of *_LITERAL flags"""
+
+    types = literal_memo.get(s)
+    if types == None:
+        types = classify_literal(s)
+        if len(literal_memo) >= literal_memo_size:
+            literal_memo.clear()
+        literal_memo[s] = types
+    return types
 
-    def represents_double(s):
-        if s == "":
-            return False
+class Literal:
+    def represents_int(s):
+        types = literal_types(s)
+        if types & MALFORMED_LITERAL:
+            return parses_as_int(s)
+        return types & INT_LITERAL != 0
 
-        expr = s
+    def represents_long(s):
+        types = literal_types(s)
+        if types & MALFORMED_LITERAL:
+            return parses_as_long(s)
+        return types & LONG_LITERAL != 0
 
-        if s[0] == "(" and s[-1] == ")":
-            expr = s[1:-1]
-        if re.search("^Double\.", s):
-            return True
-        if expr[-1] == "d" or expr[-1] == "D":
-            expr = expr[:-1]
+    def represents_float(s):
+        types = literal_types(s)
+        if types & MALFORMED_LITERAL:
+            return parses_as_float(s)
+        return types & FLOAT_LITERAL != 0
 
-        try:
-            float(expr)
-            return True
-        except ValueError:
-            return False
+    def represents_double(s):
+        types = literal_types(s)
+        if types & MALFORMED_LITERAL:
+            return parses_as_double(s)
+        return types & DOUBLE_LITERAL != 0
 
     def represents_boolean(s):
         return s == "true" or s == "false"
@@ -109,9 +273,11 @@ class Literal:
         #         or Literal.represents_float(s) or Literal.represents_double(s)
         #         or Literal.represents_boolean(s) or Literal.represents_string(s))
 
-        return (Literal.represents_int(s) or Literal.represents_long(s) or 
-                Literal.represents_float(s) or Literal.represents_double(s) or
-                Literal.represents_boolean(s))
+        types = literal_types(s)
+        if types & MALFORMED_LITERAL:
+            return parses_as_primitive(s)
+        return types & (INT_LITERAL | LONG_LITERAL | FLOAT_LITERAL |
+                        DOUBLE_LITERAL | BOOLEAN_LITERAL) != 0
 
     def extract_cast_prefix(s):
 
@@ -169,6 +335,74 @@ class Literal:
     represents_primitive = Callable(represents_primitive)
     extract_cast_prefix = Callable(extract_cast_prefix)
 
+class DriverProgram:
+    """A driver program for JDart. It is kept in memory and written to
+    the disk only when it is about to be compiled"""
+
+    def __init__(self, package_name, class_name, method_name, sym_var_list, sym_var_init_vals, preamble, body):
+        self.package_name = package_name
+        self.class_name = class_name
+        self.method_name = method_name
+        self.sym_var_list = sym_var_list
+        self.sym_var_init_vals = sym_var_init_vals
+        # Lines before the class declaration, and lines of the class
+        # up to its main method
+        self.preamble = preamble
+        self.body = body
+
+        self.path = package_name.replace(".", os.sep)
+        # canonical_driver_key of the driver program, once it is
+        # computed
+        self.key = None
+
+    def renamed(self, package_name, class_name):
+        """Returns the same driver program in another package and
+        class"""
+
+        return DriverProgram(package_name, class_name, self.method_name,
+                             list(self.sym_var_list),
+                             list(self.sym_var_init_vals),
+                             self.preamble, self.body)
+
+    def source(self):
+        lines = ["// This is an automatically generated file",
+                 "package " + self.package_name + ";\n"]
+        lines.extend(self.preamble)
+        lines.append("public class " + self.class_name + " {\n")
+        lines.extend(self.body)
+
+        lines.append("  " + "public static void main(String[] args) throws Throwable {")
+        lines.append("    " + self.class_name + " tc0 = new " + self.class_name + "();")
+        lines.append("    " + "try {")
+        lines.append("      " + "tc0.%s(%s);" % (
+            self.method_name, ', '.join(self.sym_var_init_vals)))
+        lines.append("    " + "} catch (Exception e) {")
+        lines.append("    " + "}")
+        lines.append("  " + "}")
+
+        lines.append("}\n")
+
+        return "\n".join(lines)
+
+    def file_path(self, extension):
+        return os.path.join(self.path, self.class_name + extension)
+
+    def write(self):
+        """Writes the driver program to its package directory and
+        returns the path of the file"""
+
+        try:
+            os.makedirs(self.path)
+        except OSError as exception:
+            if exception.errno != errno.EEXIST:
+                raise
+
+        whole_path = self.file_path(".java")
+        with open(whole_path, 'w') as f:
+            f.write(self.source())
+
+        return whole_path
+
 class SymbolicUnitTests:
 
     def __init__(self, package_name, input_file, class_names):
@@ -182,16 +416,10 @@ class SymbolicUnitTests:
         # I'll revisit this latter
         # assert re.match("[a-zA-Z][a-zA-Z]*(\.[a-zA-Z][a-zA-Z]*)*", package_name)
         self.package_name = package_name
-        
-        self.path = package_name.replace(".", os.sep)
 
-        try:
-            os.makedirs(self.path)
-        except OSError as exception:
-            if exception.errno != errno.EEXIST:
-                raise
         self.sym_var_list = []
         self.sym_var_init_vals = []
+        self.driver = None
 
     def initialize_output_file(self):
         self.output_file = []
@@ -201,131 +429,86 @@ class SymbolicUnitTests:
         self.sym_var_init_vals = []
         self.method_name = None
         self.method_def_pos = None
-        self.wrote_test_case = False
+        self.class_def_pos = None
+        self.driver = None
 
-    def finalize_and_write_output_file(self):
+    def finalize_output_file(self):
 
-        if not re.search("sym_var", " ".join(self.output_file)):
+        for line in self.output_file:
+            if "sym_var" in line:
+                break
+        else:
             return
 
         self.output_file[self.method_def_pos] = self.output_file[self.method_def_pos].replace(
             "()", "(" + ", ".join(self.sym_var_list) + ")"
         )
-        self.output_file.append("  " + "public static void main(String[] args) throws Throwable {")
-
-        self.output_file.append("    " + self.class_name + " tc0 = new " + self.class_name + "();")
-        self.output_file.append("    " + "try {")
-        self.output_file.append("      " + "tc0.%s(%s);" % (
-            self.method_name, ', '.join(self.sym_var_init_vals)))
-        self.output_file.append("    " + "} catch (Exception e) {")
-        self.output_file.append("    " + "}")
-        self.output_file.append("  " + "}")
 
-        self.output_file.append("}\n")
+        # The first two lines are the header and the package
+        # declaration
+        self.driver = DriverProgram(
+            self.package_name, self.class_name, self.method_name,
+            self.sym_var_list, self.sym_var_init_vals,
+            self.output_file[2:self.class_def_pos],
+            self.output_file[self.class_def_pos + 1:])
 
-        with open(os.path.join(self.path, self.class_name + ".java"), 'w') as f:
-            f.write("\n".join(self.output_file))
 
-        self.wrote_test_case = True
+    def find_parameter_parantheses(self, line, tokens = None):
 
-
-    def find_parameter_parantheses(self, line):
-
-        # Keeps track of whether we are in a string literal
-        in_double_quotes = False
+        if tokens == None:
+            tokens = tokenize(line)
 
         stack = []
-        left = -1
-        right = -1
-        i = 0
         length = len(line)
 
-        while i < length:
-
-            if in_double_quotes:
-                if line[i] == "\\":
-                    i += 1
-
-                elif line[i] == '"':
-                    in_double_quotes = False
-                
-                i += 1
-                continue
-
-            if line[i] == '\"':
-                in_double_quotes = True
-                i += 1
+        for (i, token, kind) in tokens:
+            if kind != PUNCTUATION or token == ',':
                 continue
 
-            if line[i] == '(':
+            if token == '(':
                 stack.append(i)
-            elif line[i] == ')':
-                if i == (len(line) - 2) and line[i + 1] == ";" and len(stack) == 1:
-                    left = stack.pop()
-                    right = i
-                    break
-                else:
-                    stack.pop()
-
-            i += 1
+            elif i == length - 2 and line[i + 1] == ";" and len(stack) == 1:
+                return (stack.pop(), i)
+            else:
+                stack.pop()
 
-        return (left, right)
+        return (-1, -1)
 
     # A method that splits a string into a list of
     # parameters. Parameters are delimited by a comma
-    def split_into_parameters(self, s):
+    def split_into_parameters(self, s, tokens = None):
 
-        list_of_parameters = []
+        if tokens == None:
+            tokens = tokenize(s)
 
-        in_double_quotes = False
-
-        length = len(s)
-        i = 0
+        list_of_parameters = []
 
         start = 0
         in_word = False
 
-        while i < length:
-
-            if not in_word and s[i] != ',':
-                start = i
-                in_word = True
-
-            if in_double_quotes:
-                if s[i] == "\\":
-                    i += 2
-                    continue
-
-                elif s[i] == '"':
-                    in_double_quotes = False
-                    in_word = False
-                    list_of_parameters.append(s[start:i+1].lstrip().rstrip())
-                    i += 1
-
-                else:
-                    i += 1
+        for (i, token, kind) in tokens:
 
-                continue
-
-            if s[i] == '\"':
-                in_double_quotes = True
+            if kind == STRING or kind == UNTERMINATED_STRING:
+                # A string literal always starts a new parameter and a
+                # terminated one always ends it
                 start = i
-                in_word = True
-                i += 1
+                in_word = kind == UNTERMINATED_STRING
+                if not in_word:
+                    list_of_parameters.append(s[start:i + len(token)].strip())
                 continue
 
-            if s[i] == ',':
+            if token == ',':
                 if in_word:
-                    list_of_parameters.append(s[start:i].lstrip().rstrip())
+                    list_of_parameters.append(s[start:i].strip())
                     in_word = False
-                
-                i += 1
                 continue
 
-            i += 1
+            if not in_word:
+                start = i
+                in_word = True
 
         if in_word:
-            list_of_parameters.append(s[start:].lstrip().rstrip())
+            list_of_parameters.append(s[start:].strip())
 
         return list_of_parameters
 
@@ -343,26 +526,20 @@ class SymbolicUnitTests:
             for line_nl in f:
                 # Remove the newline character
                 line = line_nl[:-1]
-                whitespace = line[:len(line) - len(line.lstrip())]
-
-                if re.search("public class", line):
-                    continue
+                lstripped_line = line.lstrip()
+                whitespace = line[:len(line) - len(lstripped_line)]
 
-                if re.search("@Test", line.lstrip()):
+                if is_skipped_line(line):
                     continue
 
-                # If this is a line that imports JUnit classes, a line
-                # that defines a debugging variable, or the final line
-                # that only has a closing bracket of the class, skip it
-                if re.search("import ", line) or re.search("public static boolean debug = false;", line) or line[0:1] == '}' or re.search("if \(debug\)", line) or re.search("NAME_ASCENDING", line):
-                    continue
+                is_method_definition = "public void" in line
 
                 # Extract the leading whitespace in a line of the first
                 # method definitinion, method name, and create the
                 # single-method class name
-                if re.search("public void", line):
+                if is_method_definition:
                     if method_count != 0:
-                        self.finalize_and_write_output_file()
+                        self.finalize_output_file()
                         self.initialize_output_file()
 
                     method_count += 1
@@ -372,58 +549,62 @@ class SymbolicUnitTests:
                     # extract method name and store it for later usage
                     self.method_name = line.lstrip().split(" ")[2][:-2]
                     has_seen_class_name = True
+                    self.class_def_pos = len(self.output_file)
                     self.output_file.append("public class " + self.class_name + " {\n")
                     self.output_file.append("  public static boolean debug = false;\n")
 
                 # Avoid too many empty lines at the beginning of the file
-                if line.lstrip() == "" and not has_seen_class_name:
+                if lstripped_line == "" and not has_seen_class_name:
                     continue
 
                 # Skip JUnit assertion statements
-                if (re.search(".*assertTrue\(", line.lstrip())
-                    or re.search(".*assertNotNull\(", line.lstrip())
-                    or re.search(".*assertNull\(", line.lstrip())
-                    or re.search(".*org.junit.Assert.fail", line.lstrip())):
+                if ("assertTrue(" in line
+                    or "assertNotNull(" in line
+                    or "assertNull(" in line
+                    or assert_fail_prog.search(line)):
                     # self.output_file.append(line)
                     continue
 
                 # Check if this is the null value assignment to a variable
-                if re.search("null;$", line):
+                if line.endswith("null;"):
                     self.output_file.append(line)
                     continue
 
                 # find the left and the right parameter paranthesis
-                (lpar, rpar) = self.find_parameter_parantheses(line.rstrip())
+                rstripped_line = line.rstrip()
+                tokens = tokenize(rstripped_line)
+                (lpar, rpar) = self.find_parameter_parantheses(rstripped_line, tokens)
+
+                is_static_call = static_call_prog.search(lstripped_line.rstrip())
 
                 # This matches only method calls (both static and
                 # non-static), and not constructors
-                if ((re.search(".* = ", line.lstrip()) == None
-                    or re.search("^.*\..*\(.*\) *;$", line.lstrip().rstrip()))
-                    and not (re.search(".* = new ", line.lstrip()))):
+                if ((not " = " in lstripped_line or is_static_call)
+                    and not " = new " in lstripped_line):
 
                     non_interesting = True
 
                     # Check if this is a static method call. The least
                     # what we expect of a static method call is of form
                     # ClassName.methodName();
-                    if re.search("^.*\..*\(.*\) *;$", line.lstrip().rstrip()):
+                    if is_static_call:
                         non_interesting = False
 
                     # Check if this is a new variable declaration
-                    elif re.search(".* = ", line):
+                    elif " = " in line:
 
                         non_interesting = False
 
                         # Check if it is a new array line
-                        if re.search("= new", line) and lpar == -1 and rpar == -1:
+                        if "= new" in line and lpar == -1 and rpar == -1:
                             non_interesting = True
 
                         # Check if it is a variable initialized to null
-                        if re.search("= null;", line):
+                        if "= null;" in line:
                             non_interesting = True
 
                     if non_interesting:
-                        if re.search("public void", line):
+                        if is_method_definition:
                             self.method_def_pos = len(self.output_file)
                         self.output_file.append(line)
                         continue
@@ -436,7 +617,10 @@ class SymbolicUnitTests:
                     self.output_file.append(line)
                     continue
 
-                parameters = self.split_into_parameters(line[lpar + 1:rpar])
+                parameters = self.split_into_parameters(
+                    line[lpar + 1:rpar],
+                    [(i - lpar - 1, token, kind) for (i, token, kind) in tokens
+                     if lpar < i < rpar])
 
                 # Assume none of the parameters will be turned to symbolic,
                 # i.e. that all of them are objects
@@ -524,7 +708,360 @@ class SymbolicUnitTests:
                 self.output_file.append(new_line)
 
         # print out the last method's class
-        self.finalize_and_write_output_file()
+        self.finalize_output_file()
+
+# A literal that the symbolizer would likely turn into a symbolic
+# variable: a number other than a long, or a boolean, as a call
+# argument, possibly negative, in parentheses or with a cast
+candidate_literal_prog = re.compile(
+    r'[(,]\s*(?:\([a-z]+\)\s*)?\(?-?(?:[0-9][0-9.]*(?:[eE]-?[0-9]+)?[fFdD]?|true|false)\)?\s*(?=[,)])')
+
+def count_candidate_literals(input_file):
+    """Estimates the number of symbolic variables a unit test would
+    give by counting primitive literals in calls, without symbolizing
+    the unit test. Like in the symbolizer, only statements that end
+    with a call are looked at, and assertions are skipped"""
+
+    count = 0
+    with open(input_file, 'r') as f:
+        for line in f:
+            if not line.rstrip().endswith(");"):
+                continue
+            if ("assertTrue(" in line or "assertNotNull(" in line
+                or "assertNull(" in line or assert_fail_prog.search(line)):
+                continue
+            count += len(candidate_literal_prog.findall(line))
+
+    return count
+
+def symbolize_unit_test(args):
+    """Turns a unit test into a driver program for JDart. Returns the
+    driver program, or None if it has no symbolic variables. It takes
+    a single (package name, unit test file, driver class name) tuple
+    so that it can be mapped over a process pool"""
+
+    (package_name, input_file, class_name) = args
+
+    symbolic_unit_test = SymbolicUnitTests(package_name, input_file, [class_name])
+    symbolic_unit_test.generate_symbolized_unit_tests()
+
+    driver = symbolic_unit_test.driver
+    if driver == None or driver.sym_var_list == []:
+        return None
+
+    return driver
+
+# A local variable declaration with an initializer, and an identifier
+# or a string literal that identifiers in it shouldn't be taken from
+declaration_prog = re.compile(r"^\s*[\w.$\[\]<>,? ]+?\s+([A-Za-z_$][\w$]*)\s*=[^=]")
+identifier_prog = re.compile(r'"(?:[^"\\]|\\.)*"|[A-Za-z_$][\w$]*')
+
+def canonical_driver_key(symbolic_unit_test):
+    """Returns a key that is the same for driver programs that differ
+    only in their package, names of their class, method and local
+    variables, and initial values of symbolic variables. JDart
+    explores the same paths for all such driver programs"""
+
+    import hashlib
+
+    lines = symbolic_unit_test.source().split("\n")
+
+    # The call with initial values of symbolic variables in main()
+    initial_call = "tc0.%s(" % symbolic_unit_test.method_name
+
+    names = sets.Set([sym_var.split(" ")[1] for sym_var in symbolic_unit_test.sym_var_list])
+    body = []
+    for line in lines:
+        if line.startswith("package ") or initial_call in line:
+            continue
+        m = declaration_prog.match(line)
+        if m:
+            names.add(m.group(1))
+        body.append(line)
+
+    # Rename in the order of first appearance
+    renaming = {
+        symbolic_unit_test.class_name: "C",
+        symbolic_unit_test.method_name: "m",
+    }
+    def rename(m):
+        name = m.group()
+        if name in renaming:
+            return renaming[name]
+        if name in names:
+            renaming[name] = "v%i" % len(renaming)
+            return renaming[name]
+        return name
+
+    return hashlib.sha1(identifier_prog.sub(rename, "\n".join(body))).hexdigest()
+
+# A local variable declaration with an initializer, with the type of
+# the variable, and a callee (a constructor, or a method with an
+# optional qualifier) right before the opening parenthesis of a call
+typed_declaration_prog = re.compile(r"^\s*([\w.$\[\]<>,? ]+?)\s+([A-Za-z_$][\w$]*)\s*=[^=]")
+callee_prog = re.compile(r"(new\s+)?([A-Za-z_$][\w$.]*)\s*$")
+
+def driver_family(symbolic_unit_test, level = "method"):
+    """Returns the family of a driver program: the class ("class"
+    level) or the method ("method" level) that the last call with a
+    symbolic variable as an argument goes to. Methods called on local
+    variables are attributed to the declared type of the variable"""
+
+    types = {}
+    family = None
+    for line in symbolic_unit_test.body:
+        m = typed_declaration_prog.match(line)
+        if m:
+            # Type arguments don't make a different family
+            types[m.group(2)] = re.sub("<.*>", "", m.group(1)).strip()
+
+        position = line.find("sym_var")
+        if position == -1:
+            continue
+
+        # Find the opening parenthesis of the call that the symbolic
+        # variable is an argument of, skipping casts and parentheses
+        # in string literals
+        parentheses = [(i, token) for (i, token, kind) in tokenize(line[:position])
+                       if kind == PUNCTUATION and token != ',']
+        depth = 0
+        m = None
+        for (i, token) in reversed(parentheses):
+            if token == ')':
+                depth += 1
+            elif depth > 0:
+                depth -= 1
+            else:
+                m = callee_prog.search(line[:i])
+                if m:
+                    break
+        if not m:
+            continue
+
+        if m.group(1):
+            (class_name, method_name) = (m.group(2), "<init>")
+        elif "." in m.group(2):
+            (qualifier, _, method_name) = m.group(2).rpartition(".")
+            class_name = types.get(qualifier, qualifier)
+        else:
+            (class_name, method_name) = (symbolic_unit_test.class_name, m.group(2))
+        family = (class_name, method_name)
+
+    if family == None:
+        return "?"
+    if level == "class":
+        return family[0]
+    return "%s.%s" % family
+
+qualified_name_prog = re.compile(r"[A-Za-z_$][\w$]*(?:\.[A-Za-z_$][\w$]*)*")
+declared_variable_prog = re.compile(r"^\s*[\w$.<>\[\], ]+?\s+([A-Za-z_$][\w$]*)\s*=")
+type_follows_prog = re.compile(r"[\[<>]|\s+[A-Za-z_$]")
+cast_follows_prog = re.compile(r"\s*\)\s*[\w$(\"']")
+type_precedes_prog = re.compile(r"(?:(?:^|[^\w$])(?:new|instanceof)\s+|<)$")
+
+def in_type_position(line, start, end):
+    """Checks if a name that spans line[start:end] is used as a type:
+    it declares a variable of the type, it is an array type, a generic
+    type or a type argument, it is created with new, checked with
+    instanceof, or cast to"""
+
+    before = line[:start]
+    after = line[end:]
+    if type_precedes_prog.search(before):
+        return True
+    if before.rstrip().endswith("("):
+        return cast_follows_prog.match(after) != None
+    return type_follows_prog.match(after) != None
+
+def exercised_classes(symbolic_unit_test, sut_classes):
+    """Returns the set of classes under test, by their fully qualified
+    names, that a driver program refers to. Randoop refers to classes
+    by their fully qualified names, which are followed by names of
+    nested classes, static members, or nothing. A class in the default
+    package has a name that any variable or method could have, so its
+    name counts only where it is used as a type, or where it is
+    followed by a member and isn't a local variable, which Java would
+    take it for instead"""
+
+    variables = set()
+    for line in symbolic_unit_test.body:
+        m = declared_variable_prog.match(line)
+        if m:
+            variables.add(m.group(1))
+
+    classes = set()
+    for line in symbolic_unit_test.body:
+        for (i, token, kind) in tokenize(line):
+            if kind != TEXT:
+                continue
+            for m in qualified_name_prog.finditer(token):
+                parts = m.group().split(".")
+                for n in range(len(parts), 0, -1):
+                    prefix = ".".join(parts[:n])
+                    if prefix not in sut_classes:
+                        continue
+                    if n == 1:
+                        if len(parts) > 1:
+                            if prefix in variables:
+                                break
+                        elif not in_type_position(line, i + m.start(), i + m.end()):
+                            break
+                    classes.add(prefix)
+                    break
+    return classes
+
+class SymbolizationCache:
+    """Driver programs of unit tests that were symbolized before, keyed
+    by a hash of the lines of a unit test that affect its driver
+    program. Unit tests that don't give a driver are cached too. The
+    least recently used entries are evicted beyond max_size entries,
+    and the cache can be saved to a file to reuse it in later runs"""
+
+    # Saved caches in other formats are ignored
+    FORMAT = 2
+
+    def __init__(self, filename = None, max_size = 10000):
+        from collections import OrderedDict
+
+        self.filename = filename
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if filename != None and os.path.exists(filename):
+            import cPickle
+            try:
+                with open(filename, 'rb') as f:
+                    (cache_format, entries) = cPickle.load(f)
+                if cache_format == self.FORMAT:
+                    self.entries = entries
+                else:
+                    sys.stderr.write("Ignoring a symbolization cache %s in another format\n" % filename)
+            except Exception, err:
+                sys.stderr.write("Ignoring a broken symbolization cache %s: %s\n" % (filename, err))
+            self.evict()
+
+    def key(self, input_file):
+        import hashlib
+
+        digest = hashlib.sha1()
+        with open(input_file, 'r') as f:
+            for line_nl in f:
+                if not is_skipped_line(line_nl[:-1]):
+                    digest.update(line_nl)
+
+        return digest.hexdigest()
+
+    def lookup(self, key, package_name, class_name):
+        """Returns a pair of whether the key is in the cache and the
+        driver program for it, in the given package and class"""
+
+        if not key in self.entries:
+            self.misses += 1
+            return (False, None)
+
+        self.hits += 1
+        # Make it the most recently used one
+        driver = self.entries.pop(key)
+        self.entries[key] = driver
+
+        if driver == None:
+            return (True, None)
+
+        return (True, driver.renamed(package_name, class_name))
+
+    def store(self, key, driver):
+        """Caches a result of symbolize_unit_test"""
+
+        self.entries.pop(key, None)
+        self.entries[key] = driver
+        self.evict()
+
+    def evict(self):
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last = False)
+            self.evictions += 1
+
+    def save(self):
+        if self.filename == None:
+            return
+
+        import cPickle
+
+        with open(self.filename + ".tmp", 'wb') as f:
+            cPickle.dump((self.FORMAT, self.entries), f, cPickle.HIGHEST_PROTOCOL)
+        os.rename(self.filename + ".tmp", self.filename)
+
+def benchmark(directory, repeat = 10):
+    """Symbolizes every unit test file in a directory repeat times and
+    returns the throughput in files per second. Like in JDoop, only
+    files with a number at the end of their name are unit tests; the
+    others are suites"""
+
+    import time
+
+    prog = re.compile(".*[0-9]+\.java$")
+    input_files = [os.path.join(directory, name)
+                   for name in sorted(os.listdir(directory))
+                   if prog.match(name)]
+
+    start_time = time.time()
+    for i in range(repeat):
+        for (j, input_file) in enumerate(input_files):
+            unit_tests = SymbolicUnitTests("benchmarked", input_file, ["test%iClass" % j])
+            unit_tests.generate_symbolized_unit_tests()
+    elapsed = time.time() - start_time
+
+    return len(input_files) * repeat / max(elapsed, 1e-9)
+
+def benchmark_literals(directory, repeat = 10):
+    """Classifies the parameters of calls in the unit tests of a
+    directory the way the symbolization does, once with the parses_as_*
+    checks and once with literal_types(). Returns the throughput of
+    both in parameters per second"""
+
+    import time
+
+    prog = re.compile(".*[0-9]+\.java$")
+    input_files = [os.path.join(directory, name)
+                   for name in sorted(os.listdir(directory))
+                   if prog.match(name)]
+
+    unit_tests = SymbolicUnitTests("benchmarked", None, ["testClass"])
+
+    corpus = []
+    for input_file in input_files:
+        with open(input_file) as f:
+            for line in f:
+                line = line.rstrip()
+                (lpar, rpar) = unit_tests.find_parameter_parantheses(line)
+                if lpar != -1 and rpar != -1:
+                    corpus.extend(unit_tests.split_into_parameters(line[lpar + 1:rpar]))
+
+    def classify_with_parsing():
+        for s in corpus:
+            if parses_as_primitive(s):
+                (parses_as_int(s) or parses_as_float(s) or
+                 parses_as_double(s) or parses_as_boolean(s))
+
+    def classify_with_types():
+        literal_memo.clear()
+        for s in corpus:
+            if Literal.represents_primitive(s):
+                (Literal.represents_int(s) or Literal.represents_float(s) or
+                 Literal.represents_double(s) or Literal.represents_boolean(s))
+
+    rates = []
+    for classify in [classify_with_parsing, classify_with_types]:
+        start_time = time.time()
+        for i in range(repeat):
+            classify()
+        elapsed = time.time() - start_time
+        rates.append(len(corpus) * repeat / max(elapsed, 1e-9))
+
+    return tuple(rates)
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Process JUnit tests generated by Randoop to make them fit for symbolic analysis by jDART.')
@@ -533,8 +1070,21 @@ if __name__ == "__main__":
     parser.add_argument('--listfile', default='classes-to-analyze')
     parser.add_argument('--unit-tests-name', default='Randoop1Test')
     parser.add_argument('--unit-tests-directory', default='tests-round-1')
+    parser.add_argument('--benchmark', default=None, metavar='DIRECTORY', help='Measure how many files per second from a directory can be symbolized')
+    parser.add_argument('--benchmark-literals', default=None, metavar='DIRECTORY', help='Measure how many call parameters from unit tests in a directory can be classified as literals per second')
+    parser.add_argument('--repeat', default=10, type=int, help='How many times to symbolize each file when benchmarking')
     params = parser.parse_args()
 
+    if params.benchmark != None:
+        print "%.1f files/sec" % benchmark(params.benchmark, params.repeat)
+        sys.exit(0)
+
+    if params.benchmark_literals != None:
+        (parsing, types) = benchmark_literals(params.benchmark_literals, params.repeat)
+        print "parsing: %.1f parameters/sec" % parsing
+        print "literal types: %.1f parameters/sec (%.1fx)" % (types, types / parsing)
+        sys.exit(0)
+
     asdf = '%s/%s%s' % (params.unit_tests_directory, params.unit_tests_name, '260.java')
     print asdf
     unit_tests = SymbolicUnitTests(params.package, "classes-to-analyze", asdf, ["test260Class"])
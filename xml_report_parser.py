@@ -18,30 +18,92 @@
 # along with JDoop.  If not, see <http://www.gnu.org/licenses/>.
 
 # A class that extracts branch and instruction coverage from a JaCoCo
-# code coverage XML report
+# code coverage XML report. The report is read as a stream of parser
+# events, so memory use doesn't grow with the size of the report
 
 
-import sys
-from BeautifulSoup import BeautifulStoneSoup
+import os, sys
+from xml.etree import cElementTree
+
+# Elements that have counters of their own, and the level of the
+# counters they have
+counter_levels = {
+    'report': 'bundle',
+    'group': 'group',
+    'package': 'package',
+    'class': 'class',
+    'method': 'method',
+}
 
 class xml_report_parser:
     def __init__(self, filename):
         self.filename = filename
         self.counters = None
-        self.soup = BeautifulStoneSoup(open(filename).read())
+        self.table = None
+
+    def iter_counters(self):
+        """Yields a (level, name, type, missed, covered) tuple for every
+        counter in the report. Counters of source files are skipped
+        as they repeat those of classes"""
+
+        # Names of the elements we are in, from the outermost one
+        names = []
+        # Elements we are in, from the outermost one. A finished
+        # element is cleared and removed from its parent, so only
+        # these elements and their attributes are kept in memory
+        open_elements = []
+
+        for (event, elem) in cElementTree.iterparse(self.filename, events=('start', 'end')):
+            tag = elem.tag
+
+            if event == 'start':
+                open_elements.append(elem)
+                if tag in counter_levels or tag == 'sourcefile':
+                    name = elem.get('name')
+                    if tag == 'method':
+                        name = "%s.%s%s" % (names[-1][1], name, elem.get('desc'))
+                    names.append((tag, name))
+                continue
+
+            if tag == 'counter':
+                (parent_tag, parent_name) = names[-1]
+                if parent_tag != 'sourcefile':
+                    yield (counter_levels[parent_tag], parent_name,
+                           elem.get('type'), int(elem.get('missed')),
+                           int(elem.get('covered')))
+
+            elif tag in counter_levels or tag == 'sourcefile':
+                names.pop()
+
+            open_elements.pop()
+            elem.clear()
+            if open_elements:
+                open_elements[-1].remove(elem)
+
+    def counter_table(self):
+        """Returns a list of all counters in the report, as given by
+        iter_counters"""
+
+        if self.table == None:
+            self.table = list(self.iter_counters())
+
+        return self.table
 
     def find_counter(self, type):
         if self.counters == None:
-            # Check only last 6 counters because they are global
-            # summaries for the whole package
-            self.counters = self.soup.findAll('counter')[-6:]
+            # Keep only global summaries for the whole bundle
+            if self.table != None:
+                counters = self.table
+            else:
+                counters = self.iter_counters()
+            self.counters = [counter for counter in counters
+                             if counter[0] == 'bundle']
 
         ret = dict()
-        for counter in self.counters:
-            counter_attrs = dict(counter.attrs)
-            if counter_attrs[u'type'] == type:
-                ret['covered'] = int(counter_attrs[u'covered'])
-                ret['total'] = ret['covered'] + int(counter_attrs[u'missed'])
+        for (level, name, counter_type, missed, covered) in self.counters:
+            if counter_type == type:
+                ret['covered'] = covered
+                ret['total'] = covered + missed
                 break
 
         return ret
@@ -52,7 +114,91 @@ class xml_report_parser:
     def instruction_coverage(self):
         return self.find_counter(u'INSTRUCTION')
 
+def compare_reports(old_parser, new_parser, level = 'class'):
+    """Returns counters at a given level whose coverage differs between
+    two reports, as (name, type, old covered, new covered) tuples"""
+
+    old_covered = dict(((name, counter_type), covered) for
+                       (l, name, counter_type, missed, covered) in
+                       old_parser.iter_counters() if l == level)
+
+    ret = []
+    for (l, name, counter_type, missed, covered) in new_parser.iter_counters():
+        if l != level:
+            continue
+        before = old_covered.get((name, counter_type), 0)
+        if before != covered:
+            ret.append((name, counter_type, before, covered))
+
+    return ret
+
+def write_synthetic_report(filename, packages, classes_per_package):
+    """Writes a JaCoCo-like XML report with a method, a source file and
+    a few lines per class"""
+
+    counters = ''.join(['<counter type="%s" missed="1" covered="2"/>' % t
+                        for t in ['INSTRUCTION', 'BRANCH', 'LINE', 'METHOD']])
+    with open(filename, 'w') as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?><report name="synthetic">')
+        for p in xrange(packages):
+            f.write('<package name="p%d">' % p)
+            for c in xrange(classes_per_package):
+                f.write('<class name="p%d/C%d"><method name="m" desc="()V" line="1">%s</method>%s</class>'
+                        % (p, c, counters, counters))
+                f.write('<sourcefile name="C%d.java">%s%s</sourcefile>' % (
+                    c, ''.join(['<line nr="%d" mi="0" ci="1" mb="0" cb="0"/>' % l for l in range(5)]),
+                    counters))
+            f.write('%s</package>' % counters)
+        f.write('%s</report>' % counters)
+
+def peak_memory(filename):
+    """Reads all counters of a report in a new process and returns the
+    peak resident memory of the process, in kilobytes"""
+
+    import subprocess
+    output = subprocess.check_output([sys.executable, __file__, "--peak-memory", filename])
+    return int(output.split()[-1])
+
+def check_memory(rows = 60000):
+    """Checks that peak memory of reading a report doesn't depend on
+    how many classes a package has, by reading two reports with the
+    same number of classes in 60 packages and in one package"""
+
+    import tempfile, shutil
+
+    directory = tempfile.mkdtemp()
+    try:
+        many_packages = os.path.join(directory, "many-packages.xml")
+        one_package = os.path.join(directory, "one-package.xml")
+        write_synthetic_report(many_packages, 60, rows / 60)
+        write_synthetic_report(one_package, 1, rows)
+
+        many_packages_peak = peak_memory(many_packages)
+        one_package_peak = peak_memory(one_package)
+    finally:
+        shutil.rmtree(directory)
+
+    print "Peak memory with 60 packages: %d KB, with one package: %d KB" % (
+        many_packages_peak, one_package_peak)
+    return one_package_peak < 2 * many_packages_peak
+
 if __name__ == "__main__":
+    if sys.argv[1] == "--check-memory":
+        sys.exit(0 if check_memory() else 1)
+
+    if sys.argv[1] == "--peak-memory":
+        import resource
+        for counter in xml_report_parser(sys.argv[2]).iter_counters():
+            pass
+        print resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        sys.exit(0)
+
     parser = xml_report_parser(sys.argv[1])
     print parser.branch_coverage()
     print parser.instruction_coverage()
+
+    # With a second report, show classes whose coverage changed
+    if len(sys.argv) > 2:
+        for (name, counter_type, before, after) in compare_reports(
+                parser, xml_report_parser(sys.argv[2])):
+            print "%s %s: %d -> %d" % (name, counter_type, before, after)